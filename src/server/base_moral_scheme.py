@@ -75,6 +75,32 @@ class BaseMoralScheme:
         self.appraisals_state = self.appraisals[:half] - self.appraisals[half:]
         self.feelings_state = self.feelings[:half] - self.feelings[half:]
     
+    def get_state(self):
+        """
+        Векторы схемы для сохранения сессии
+        
+        Returns:
+            dict: Векторы в виде списков (сериализуемы в JSON)
+        """
+        return {
+            "appraisals": self.appraisals.tolist(),
+            "feelings": self.feelings.tolist(),
+            "appraisals_state": self.appraisals_state.tolist(),
+            "feelings_state": self.feelings_state.tolist()
+        }
+    
+    def set_state(self, state):
+        """
+        Восстанавливает векторы схемы
+        
+        Args:
+            state (dict): Результат get_state()
+        """
+        self.appraisals = np.array(state["appraisals"])
+        self.feelings = np.array(state["feelings"])
+        self.appraisals_state = np.array(state["appraisals_state"])
+        self.feelings_state = np.array(state["feelings_state"])
+    
     # Методы доступа к состояниям:
     def get_appraisals(self): return self.appraisals
     def get_feelings(self): return self.feelings
@@ -0,0 +1,53 @@
+import json
+import time
+from pydantic import TypeAdapter
+import wss_codec
+from request_contracts import WssItem
+
+# Типичное входящее сообщение: реплика чата и абзац эссе
+SAMPLES = [
+    {"type": "chat", "content": "Здравствуйте! Давайте начнем урок.", "timestamp": "2024-11-20T10:15:30.123Z"},
+    {"type": "essay", "content": "Чат-боты с использованием ИИ " * 40, "timestamp": "2024-11-20T10:16:02.456Z"}
+]
+
+def legacy_roundtrip(raw):
+    """Прежний путь обработчика: json.loads + новый TypeAdapter + model_dump + send_json"""
+    data_model = TypeAdapter(WssItem).validate_python(json.loads(raw))
+    return json.dumps(data_model.model_dump(), ensure_ascii=False, separators=(",", ":"))
+
+def json_roundtrip(raw):
+    """Общий кодек: validate_json + dump_json"""
+    return wss_codec.encode_json(wss_codec.decode_json(raw))
+
+def binary_roundtrip(raw):
+    """Бинарные кадры подпротокола vt.bin.v1"""
+    return wss_codec.encode_binary(wss_codec.decode_binary(raw))
+
+def bench(name, func, payloads, duration):
+    """
+    Измеряет количество сообщений в секунду на одном ядре
+
+    Args:
+        name (str): Название варианта
+        func (callable): Обработка одного сообщения
+        payloads (list): Входные кадры
+        duration (float): Длительность измерения в секундах
+    """
+    count = 0
+    started = time.perf_counter()
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        for raw in payloads:
+            func(raw)
+        count += len(payloads)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<8} {count / elapsed:>12,.0f} msg/s per core")
+
+# Запуск: python bench_codec.py
+if __name__ == "__main__":
+    json_payloads = [json.dumps(sample, ensure_ascii=False) for sample in SAMPLES]
+    binary_payloads = [wss_codec.encode_binary(WssItem(**sample)) for sample in SAMPLES]
+
+    bench("legacy", legacy_roundtrip, json_payloads, 2.0)
+    bench("json", json_roundtrip, json_payloads, 2.0)
+    bench("binary", binary_roundtrip, binary_payloads, 2.0)
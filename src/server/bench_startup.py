@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Код, выполняемый в чистом процессе: импорт сервера, запуск приложения и первая сессия
+BOOT_SCRIPT = """
+import time
+from starlette.testclient import TestClient
+started = time.perf_counter()
+import test_server
+imported = time.perf_counter()
+with TestClient(test_server.app):
+    booted = time.perf_counter()
+    from virtual_tutor import VirtualTutor
+    VirtualTutor(0)
+    session = time.perf_counter()
+print(imported - started, booted - imported, session - booted)
+"""
+
+def measure_boot(runs):
+    """
+    Запускает BOOT_SCRIPT в новых процессах
+
+    Args:
+        runs (int): Количество запусков
+
+    Returns:
+        list: Кортежи (импорт, запуск приложения, первая сессия) в секундах
+    """
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", BOOT_SCRIPT], cwd=SERVER_DIR,
+            capture_output=True, text=True, check=True).stdout
+        results.append(tuple(float(x) for x in output.split()[-3:]))
+    return results
+
+def measure_imports(top=10):
+    """
+    Самые долгие импорты test_server по данным python -X importtime
+
+    Args:
+        top (int): Количество модулей в выводе
+
+    Returns:
+        list: Пары (время в мс с учетом вложенных импортов, модуль)
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import test_server"], cwd=SERVER_DIR,
+        capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]) / 1000, parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+def measure_config(calls):
+    """Время доступа к конфигурации: чтение YAML с диска против общего объекта Settings"""
+    import helper as hlp
+    import settings as cfg
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        hlp.load_config()
+    yaml_sec = time.perf_counter() - started
+
+    cfg.get_settings()
+    started = time.perf_counter()
+    for _ in range(calls):
+        cfg.get_settings()
+    cached_sec = time.perf_counter() - started
+    return yaml_sec / calls, cached_sec / calls
+
+# Запуск: python bench_startup.py
+if __name__ == "__main__":
+    boots = measure_boot(5)
+    for name, i in (("import test_server", 0), ("app startup", 1), ("first session", 2)):
+        values = sorted(b[i] for b in boots)
+        print(f"{name:<20} median {values[len(values) // 2] * 1000:8.1f} ms")
+
+    print("\nslowest imports (cumulative):")
+    for ms, module in measure_imports():
+        print(f"  {ms:8.1f} ms {module}")
+
+    yaml_call, cached_call = measure_config(200)
+    print(f"\nload_config()  {yaml_call * 1e6:10.1f} us/call")
+    print(f"get_settings() {cached_call * 1e6:10.1f} us/call")
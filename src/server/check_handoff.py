@@ -0,0 +1,184 @@
+import json
+from datetime import datetime, timezone
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import yaml
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+import helper as hlp
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+UPSTREAM_PORT, PORT_A, PORT_B, PORT_C, PORT_D = 9301, 8301, 8302, 8303, 8304
+ADMIN_TOKEN = "check-handoff"
+
+def start(args, env):
+    """Запускает процесс из папки сервера"""
+    return subprocess.Popen([sys.executable] + args, cwd=SERVER_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def start_server(port, env):
+    """Запускает test_server на порту и ждет готовности /health"""
+    process = start(["-m", "uvicorn", "test_server:app", "--port", str(port)], env)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Сервер на порту {port} не запустился")
+
+def make_message(text):
+    """Реплика студента с текущей временной меткой"""
+    return json.dumps({"type": "chat", "content": text, "timestamp": datetime.now(timezone.utc).isoformat()})
+
+def chat(ws, text):
+    """Отправляет реплику и возвращает ответ тьютора"""
+    ws.send(make_message(text))
+    return json.loads(ws.recv(timeout=30))
+
+def wait_sessions(port, expected, timeout=5):
+    """Ждет, пока сервер обработает отключения, и возвращает /health"""
+    stop_at = time.monotonic() + timeout
+    while True:
+        health = json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2))
+        if health["sessions"] == expected or time.monotonic() > stop_at:
+            return health
+        time.sleep(0.05)
+
+def write_config(workdir, name, deadline):
+    """Пишет config.yaml с фейковым upstream и возвращает окружение для процессов"""
+    config = hlp.load_config()
+    config["endpoints"] = [{"name": "fake", "url": f"http://127.0.0.1:{UPSTREAM_PORT}"}]
+    config["drain"] = {"checkpoint_dir": os.path.join(workdir, "checkpoints"),
+                       "deadline": deadline, "admin_token": ADMIN_TOKEN}
+    config_file = os.path.join(workdir, name)
+    with open(config_file, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return dict(os.environ, VIRTUAL_TUTOR_CONFIG=config_file)
+
+def check(condition, message):
+    print(("OK   " if condition else "FAIL ") + message)
+    if not condition:
+        sys.exit(1)
+
+# Проверка передачи сессии между двумя процессами с фейковым upstream:
+#   python check_handoff.py
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp(prefix="vt_handoff_")
+    env = write_config(workdir, "config.yaml", deadline=10)
+    # Без ожидания ходов: ход, прерванный остановкой, сохраняет сам обработчик
+    env_no_wait = write_config(workdir, "config_no_wait.yaml", deadline=0)
+
+    # Задержка upstream, чтобы сигнал приходил во время хода
+    processes = [start(["fake_upstream.py", "--port", str(UPSTREAM_PORT), "--yes-rate", "0",
+                        "--delay", "0.5"], env)]
+    try:
+        client_id = int(time.time())
+        processes.append(start_server(PORT_A, env))
+
+        # 1. Два хода на процессе A
+        with connect(f"ws://127.0.0.1:{PORT_A}/test_2/ws/{client_id}") as ws:
+            chat(ws, "Здравствуйте")
+            reply = chat(ws, "Расскажите о плане урока")
+            check("сообщений в запросе: 4" in reply["content"], f"A: {reply['content']}")
+
+            # 2. Остановка A с передачей сессии (без токена - 403)
+            drain_url = f"http://127.0.0.1:{PORT_A}/admin/drain"
+            try:
+                urllib.request.urlopen(urllib.request.Request(drain_url, method="POST"), timeout=5)
+                check(False, "drain без токена должен отвечать 403")
+            except urllib.error.HTTPError as error:
+                check(error.code == 403, "drain без токена отклонен")
+            request = urllib.request.Request(drain_url, method="POST", headers={"X-Admin-Token": ADMIN_TOKEN})
+            result = json.load(urllib.request.urlopen(request, timeout=30))
+            check(result["sessions"] == 1, f"drain: {result}")
+            message = json.loads(ws.recv(timeout=10))
+            check(message["type"] == "reconnect", "клиент получил reconnect")
+
+        checkpoint = os.path.join(workdir, "checkpoints", f"moral_{client_id}.json")
+        check(os.path.exists(checkpoint), "контрольная точка сохранена")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT_A}/health", timeout=2)
+            check(False, "A должен отвечать 503 на /health")
+        except urllib.error.HTTPError as error:
+            check(error.code == 503, "A не принимает новые сессии")
+
+        # 3. Процесс B восстанавливает сессию
+        processes.append(start_server(PORT_B, env))
+        with connect(f"ws://127.0.0.1:{PORT_B}/test_2/ws/{client_id}") as ws:
+            reply = chat(ws, "Продолжим")
+            check("сообщений в запросе: 6" in reply["content"], f"B продолжил историю: {reply['content']}")
+            check(not os.path.exists(checkpoint), "контрольная точка забрана процессом B")
+
+            # 4. SIGTERM во время хода: ход завершается, ответ доставляется, сессия сохраняется
+            ws.send(make_message("Еще вопрос"))
+            time.sleep(0.3)
+            processes[-1].send_signal(signal.SIGTERM)
+            reply = json.loads(ws.recv(timeout=30))
+            check("сообщений в запросе: 8" in reply["content"], f"SIGTERM: ход завершен: {reply['content']}")
+            message = json.loads(ws.recv(timeout=10))
+            check(message["type"] == "reconnect", "SIGTERM: клиент получил reconnect")
+        processes[-1].wait(timeout=30)
+        check(os.path.exists(checkpoint), "SIGTERM: контрольная точка сохранена")
+
+        # 5. Ход не успел к сроку остановки: соединение закрывается без ответа,
+        #    состояние сохраняется после хода, повтор сообщения не генерирует ход заново
+        processes.append(start_server(PORT_C, env_no_wait))
+        pending = make_message("Вопрос во время остановки")
+        with connect(f"ws://127.0.0.1:{PORT_C}/test_2/ws/{client_id}") as ws:
+            ws.send(pending)
+            time.sleep(0.3)
+            processes[-1].send_signal(signal.SIGTERM)
+            try:
+                message = json.loads(ws.recv(timeout=30))
+                check(False, f"ответ не должен дойти до закрытия: {message}")
+            except ConnectionClosed as closed:
+                check(closed.rcvd is not None and closed.rcvd.code == 1012, "соединение закрыто с кодом 1012")
+        processes[-1].wait(timeout=30)
+        check(os.path.exists(checkpoint), "ход после срока: контрольная точка сохранена")
+
+        processes.append(start_server(PORT_D, env))
+        with connect(f"ws://127.0.0.1:{PORT_D}/test_2/ws/{client_id}") as ws:
+            ws.send(pending)
+            reply = json.loads(ws.recv(timeout=30))
+            check("сообщений в запросе: 10" in reply["content"], f"повтор получил сохраненный ответ: {reply['content']}")
+            reply = chat(ws, "Следующий вопрос")
+            check("сообщений в запросе: 12" in reply["content"], f"ход не применен дважды: {reply['content']}")
+
+        # 6. Некорректный кадр отбрасывается, сессия продолжает работать
+        with connect(f"ws://127.0.0.1:{PORT_D}/test_2/ws/{client_id + 1}") as ws:
+            ws.send("не JSON")
+            reply = chat(ws, "Здравствуйте")
+            check(reply["type"] == "chat", "после некорректного кадра сессия отвечает")
+        health = wait_sessions(PORT_D, 0)
+        check(health["sessions"] == 0, f"сессии удалены после отключения: {health}")
+
+        # 7. Обрыв связи без закрытия: переподключение к тому же процессу продолжает сессию
+        ws = connect(f"ws://127.0.0.1:{PORT_D}/test_2/ws/{client_id + 2}")
+        chat(ws, "Здравствуйте")
+        ws.socket.close()  # Разрыв TCP без кадра закрытия
+        with connect(f"ws://127.0.0.1:{PORT_D}/test_2/ws/{client_id + 2}") as ws:
+            reply = chat(ws, "Я вернулся")
+            check("сообщений в запросе: 4" in reply["content"], f"после обрыва история сохранена: {reply['content']}")
+
+        # 8. Контрольная точка, из которой не удалось восстановить сессию, не удаляется
+        broken = os.path.join(workdir, "checkpoints", f"moral_{client_id + 3}.json")
+        with open(broken, "w", encoding="utf-8") as f:
+            json.dump({"tutor": {"messages": []}}, f)
+        with connect(f"ws://127.0.0.1:{PORT_D}/test_2/ws/{client_id + 3}") as ws:
+            try:
+                ws.recv(timeout=10)
+            except ConnectionClosed as closed:
+                check(closed.rcvd is not None and closed.rcvd.code == 1011, f"ошибка восстановления закрывает соединение: {closed}")
+        check(os.path.exists(broken), "контрольная точка возвращена после ошибки восстановления")
+        health = wait_sessions(PORT_D, 0)
+        check(health["sessions"] == 0, f"после ошибки восстановления сессий нет: {health}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,196 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+import helper as hlp
+
+# Распределение критериев из helper.essay_criteria по шагам проверки:
+SECTION_ALL = "ad"          # Выполнен, если ни один раздел его не нарушает
+SECTION_ANY = "chijklmnop"  # Выполнен, если есть хотя бы в одном разделе
+STRUCTURE = "befg"          # Проверяется по структуре эссе целиком
+
+COMPLETE_RATIO = 0.75       # Доля выполненных критериев для завершенного эссе
+MAX_WORKERS = 8             # Максимум параллельных запросов к API
+MAX_SECTION_CHARS = 4000    # Ограничение контекста одного запроса
+OUTLINE_CHARS = 200         # Длина начала раздела для проверки структуры
+
+class SectionVerdict:
+    """Вердикт по одному разделу эссе (или по структуре эссе)"""
+
+    def __init__(self, met, issues, comment):
+        """
+        Args:
+            met (set): Буквы выполненных критериев
+            issues (set): Буквы нарушенных критериев
+            comment (str): Краткий комментарий проверяющего
+        """
+        self.met = met
+        self.issues = issues
+        self.comment = comment
+
+    @classmethod
+    def from_reply(cls, reply):
+        """
+        Создает вердикт из JSON-ответа API, отбрасывая неизвестные критерии
+
+        Args:
+            reply (dict): Ответ вида {"met": [...], "issues": [...], "comment": "..."}
+
+        Returns:
+            SectionVerdict: Вердикт или None, если ответа нет
+        """
+        if reply is None:
+            return None
+
+        def letters(value):
+            if not isinstance(value, list):
+                return set()
+            return {str(v).strip().lower() for v in value} & set(hlp.essay_criteria)
+
+        return cls(letters(reply.get("met")), letters(reply.get("issues")), str(reply.get("comment", "")))
+
+    def to_dict(self):
+        """Вердикт в формате ответа API (восстанавливается через from_reply)"""
+        return {"met": sorted(self.met), "issues": sorted(self.issues), "comment": self.comment}
+
+class EssayVerdict:
+    """Итоговый вердикт по эссе, собранный из вердиктов разделов и структуры"""
+
+    def __init__(self, sections, structure):
+        """
+        Args:
+            sections (list): SectionVerdict для каждого раздела (None - нет оценки)
+            structure (SectionVerdict): Вердикт по структуре или None
+        """
+        self.sections = sections
+        self.structure = structure
+        self.criteria = self._reduce()
+
+    def _reduce(self):
+        """Сводит вердикты разделов и структуры в выполнение критериев a-p"""
+        known = [v for v in self.sections if v is not None]
+        criteria = {}
+        for letter in hlp.essay_criteria:
+            if letter in SECTION_ANY:
+                criteria[letter] = any(letter in v.met for v in known)
+            elif letter in SECTION_ALL:
+                criteria[letter] = bool(known) and not any(letter in v.issues for v in known)
+            else:
+                criteria[letter] = (self.structure is not None
+                                    and letter in self.structure.met
+                                    and letter not in self.structure.issues)
+        return criteria
+
+    def missing(self):
+        """Буквы невыполненных критериев"""
+        return [letter for letter, met in self.criteria.items() if not met]
+
+    def is_complete(self):
+        """
+        Эссе завершено, если все разделы оценены, есть выводы,
+        работа завершена и выполнена достаточная доля критериев
+        """
+        if any(v is None for v in self.sections):
+            return False
+        ratio = sum(self.criteria.values()) / len(self.criteria)
+        return self.criteria["e"] and self.criteria["p"] and ratio >= COMPLETE_RATIO
+
+    def summary(self):
+        """Короткая строка для логов"""
+        met = "".join(letter for letter, ok in self.criteria.items() if ok)
+        return f"complete={self.is_complete()} met={met} missing={''.join(self.missing())}"
+
+    def to_prompt(self):
+        """
+        Описание результатов проверки для генерации ответа тьютора
+
+        Returns:
+            str: Невыполненные критерии и комментарий по структуре
+        """
+        lines = []
+        missing = self.missing()
+        if missing:
+            lines.append("Невыполненные критерии эссе:")
+            lines.extend(f"{letter}) {hlp.essay_criteria[letter]}" for letter in missing)
+        else:
+            lines.append("Все критерии эссе выполнены")
+        if self.structure is not None and self.structure.comment:
+            lines.append(f"Структура: {self.structure.comment}")
+        lines.append("Эссе завершено" if self.is_complete() else "Эссе еще не завершено")
+        return "\n".join(lines)
+
+class EssayAnalyzer:
+    """
+    Параллельная проверка эссе: разбиение на разделы (map),
+    независимые короткие запросы по разделам и структуре, сведение в EssayVerdict (reduce)
+    """
+
+    def __init__(self, interface, max_workers=MAX_WORKERS):
+        """
+        Args:
+            interface (Interface): Интерфейс для запросов к API
+            max_workers (int): Максимум параллельных запросов
+        """
+        self.interface = interface
+        self.max_workers = max_workers
+
+    def _outline(self, essay_diff):
+        """Начала всех разделов - ограниченный контекст для проверки структуры"""
+        lines = []
+        for i, section in enumerate(essay_diff.sections, start=1):
+            first = re.split(r"(?<=[.!?])\s", section, maxsplit=1)[0]
+            lines.append(f"{i}. {first[:OUTLINE_CHARS]}")
+        return "\n".join(lines)
+
+    def analyze(self, essay_diff, draft):
+        """
+        Проверяет эссе, переиспользуя сохраненные в черновике вердикты
+
+        Args:
+            essay_diff (EssayDiff): Новый черновик
+            draft (EssayDraft): Черновик сессии с кэшем вердиктов
+
+        Returns:
+            EssayVerdict: Итоговый вердикт
+        """
+        if not essay_diff.sections:
+            return EssayVerdict([], None)  # Пустое эссе проверять нечего
+
+        title = essay_diff.title()
+        total = len(essay_diff.sections)
+        section_criteria = {letter: text for letter, text in hlp.essay_criteria.items()
+                            if letter not in STRUCTURE}
+        structure_criteria = {letter: text for letter, text in hlp.essay_criteria.items()
+                              if letter in STRUCTURE}
+
+        # Запросы только для разделов без сохраненного вердикта (при смене названия - для всех)
+        pending = {}
+        for i, key in enumerate(essay_diff.verdict_keys):
+            if draft.get_verdict(key) is None and key not in pending:
+                pending[key] = i
+        structure = draft.get_structure(essay_diff.keys)
+
+        if pending or structure is None:
+            workers = max(1, min(self.max_workers, len(pending) + 1))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    key: executor.submit(
+                        self.interface.get_section_verdict, title,
+                        essay_diff.sections[i][:MAX_SECTION_CHARS], i + 1, total, section_criteria)
+                    for key, i in pending.items()
+                }
+                structure_future = None
+                if structure is None:
+                    structure_future = executor.submit(
+                        self.interface.get_structure_verdict, title,
+                        self._outline(essay_diff), structure_criteria)
+
+                for key, future in futures.items():
+                    verdict = SectionVerdict.from_reply(future.result())
+                    if verdict is not None:
+                        draft.set_verdict(key, verdict)
+                if structure_future is not None:
+                    structure = SectionVerdict.from_reply(structure_future.result())
+                    if structure is not None:
+                        draft.set_structure(essay_diff.keys, structure)
+
+        sections = [draft.get_verdict(key) for key in essay_diff.verdict_keys]
+        return EssayVerdict(sections, structure)
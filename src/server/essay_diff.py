@@ -0,0 +1,187 @@
+import difflib
+import hashlib
+import re
+
+def split_sections(text):
+    """
+    Делит текст эссе на разделы (абзацы)
+
+    Args:
+        text (str): Полный текст эссе
+
+    Returns:
+        list: Список непустых абзацев
+    """
+    # Абзацы разделяются пустой строкой; если их нет - каждая строка считается абзацем
+    parts = re.split(r"\n\s*\n", text.strip())
+    if len(parts) == 1:
+        parts = text.strip().splitlines()
+    return [part.strip() for part in parts if part.strip()]
+
+def section_key(section):
+    """
+    Вычисляет ключ раздела, не зависящий от лишних пробелов
+
+    Args:
+        section (str): Текст раздела
+
+    Returns:
+        str: Хэш нормализованного текста
+    """
+    normalized = " ".join(section.split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+class EssayDiff:
+    """Результат сравнения нового черновика эссе с предыдущим"""
+
+    def __init__(self, version, sections, changed, removed):
+        """
+        Args:
+            version (int): Номер нового черновика
+            sections (list): Разделы нового черновика
+            changed (list): Индексы новых или измененных разделов
+            removed (int): Количество удаленных разделов
+        """
+        self.version = version
+        self.sections = sections
+        self.keys = [section_key(section) for section in sections]
+        # Вердикт раздела зависит и от названия эссе (критерий a), поэтому кэшируется по обоим
+        title_key = section_key(self.title())
+        self.verdict_keys = [f"{title_key}:{key}" for key in self.keys]
+        self.changed = changed
+        self.removed = removed
+
+    def has_changes(self):
+        """Есть ли в черновике отличия от предыдущего"""
+        return bool(self.changed) or self.removed > 0
+
+    def title(self):
+        """Название эссе - первая строка текста (критерий a)"""
+        return self.sections[0].splitlines()[0] if self.sections else ""
+
+    def changed_text(self):
+        """Текст только новых и измененных разделов"""
+        return "\n\n".join(self.sections[i] for i in self.changed)
+
+    def summary(self):
+        """
+        Компактное описание черновика для истории диалога
+
+        Returns:
+            str: Номера измененных разделов и их текст вместо полной копии эссе
+        """
+        if self.version == 1:
+            return f"Эссе (черновик 1, разделов: {len(self.sections)}):\n{self.changed_text()}"
+
+        if not self.has_changes():
+            return f"Эссе (черновик {self.version}): без изменений"
+
+        lines = [f"Эссе (черновик {self.version}, разделов: {len(self.sections)})"]
+        if self.changed:
+            numbers = ", ".join(str(i + 1) for i in self.changed)
+            lines.append(f"Изменены разделы: {numbers}")
+        if self.removed:
+            lines.append(f"Удалено разделов: {self.removed}")
+        for i in self.changed:
+            lines.append(f"[{i + 1}] {self.sections[i]}")
+        return "\n".join(lines)
+
+class EssayDraft:
+    """Последний черновик эссе сессии и кэш вердиктов по разделам"""
+
+    def __init__(self):
+        self.version = 0
+        self.keys = []      # Ключи разделов последнего черновика
+        self.verdicts = {}  # Вердикты по ключу названия и раздела
+        self.structure = None  # (ключи разделов, вердикт по структуре)
+
+    def diff(self, text):
+        """
+        Сравнивает новый текст эссе с последним черновиком
+
+        Args:
+            text (str): Полный текст нового черновика
+
+        Returns:
+            EssayDiff: Измененные и удаленные разделы
+        """
+        sections = split_sections(text)
+        keys = [section_key(section) for section in sections]
+
+        changed = []
+        removed = 0
+        matcher = difflib.SequenceMatcher(a=self.keys, b=keys, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag in ("replace", "insert"):
+                changed.extend(range(j1, j2))
+            if tag in ("replace", "delete"):
+                removed += max(0, (i2 - i1) - (j2 - j1))
+
+        return EssayDiff(self.version + 1, sections, changed, removed)
+
+    def commit(self, essay_diff):
+        """
+        Запоминает черновик как последний и удаляет вердикты исчезнувших разделов
+        и разделов с прежним названием эссе
+
+        Args:
+            essay_diff (EssayDiff): Принятый черновик
+        """
+        self.version = essay_diff.version
+        self.keys = essay_diff.keys
+        self.verdicts = {key: self.verdicts[key] for key in essay_diff.verdict_keys if key in self.verdicts}
+
+    def to_dict(self):
+        """
+        Состояние черновика для сохранения сессии
+
+        Returns:
+            dict: Версия, ключи разделов и вердикты (через их to_dict())
+        """
+        structure = None
+        if self.structure is not None:
+            structure = [self.structure[0], self.structure[1].to_dict()]
+        return {
+            "version": self.version,
+            "keys": self.keys,
+            "verdicts": {key: verdict.to_dict() for key, verdict in self.verdicts.items()},
+            "structure": structure
+        }
+
+    @classmethod
+    def from_dict(cls, data, load_verdict):
+        """
+        Восстанавливает черновик
+
+        Args:
+            data (dict): Результат to_dict()
+            load_verdict (callable): Создает вердикт из его словаря
+
+        Returns:
+            EssayDraft: Восстановленный черновик
+        """
+        draft = cls()
+        draft.version = data["version"]
+        draft.keys = data["keys"]
+        draft.verdicts = {key: load_verdict(verdict) for key, verdict in data["verdicts"].items()}
+        if data["structure"] is not None:
+            draft.structure = (data["structure"][0], load_verdict(data["structure"][1]))
+        return draft
+
+    def get_verdict(self, key):
+        """Возвращает сохраненный вердикт раздела (по EssayDiff.verdict_keys) или None"""
+        return self.verdicts.get(key)
+
+    def set_verdict(self, key, verdict):
+        """Сохраняет вердикт раздела"""
+        self.verdicts[key] = verdict
+
+    def get_structure(self, keys):
+        """Возвращает вердикт по структуре, если разделы не менялись, иначе None"""
+        if self.structure is not None and self.structure[0] == keys:
+            return self.structure[1]
+        return None
+
+    def set_structure(self, keys, verdict):
+        """Сохраняет вердикт по структуре для данного набора разделов"""
+        self.structure = (list(keys), verdict)
@@ -0,0 +1,83 @@
+import argparse
+import json
+import random
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+def fake_content(name, prompt, yes_rate, history):
+    """
+    Формирует правдоподобный ответ на промпты oai_interface
+
+    Args:
+        name (str): Имя эндпоинта (попадает в ответ тьютора)
+        prompt (str): Текст последнего сообщения запроса
+        yes_rate (float): Вероятность ответа "да" на проверку перехода
+        history (int): Количество сообщений в запросе
+
+    Returns:
+        str: Текст ответа модели
+    """
+    if "JSON" in prompt:
+        # Вердикт по разделу или структуре эссе
+        return json.dumps({"met": list("abcdefghijklmnop"), "issues": [], "comment": f"{name}: ok"})
+    if "Ответ: да/нет" in prompt:
+        return "да" if random.random() < yes_rate else "нет"
+    if "интенций" in prompt:
+        # Количество интенций = количество элементов списка через запятую
+        categories = max((line.count(", ") + 1 for line in prompt.splitlines()), default=1)
+        return ", ".join(f"{random.random():.2f}" for _ in range(categories))
+    return f"[{name}] Ответ тьютора (сообщений в запросе: {history})"
+
+def make_handler(name, delay, jitter, error_rate, yes_rate):
+    """Создает обработчик /chat/completions с заданной задержкой и долей ошибок"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(max(0.0, delay + random.uniform(-jitter, jitter)))
+
+            if random.random() < error_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+
+            messages = body.get("messages", [{}])
+            prompt = messages[-1].get("content", "")
+            content = fake_content(name, prompt, yes_rate, len(messages))
+            payload = json.dumps({
+                "model": body.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": {"total_tokens": (len(prompt) + len(content)) // 4}
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # Не засоряем вывод логами каждого запроса
+
+    return Handler
+
+# Запуск локального фейкового upstream для проверки маршрутизации без реального API:
+#   python fake_upstream.py --port 9001 --delay 0.2
+#   python fake_upstream.py --port 9002 --delay 1.5 --error-rate 0.2
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Фейковый OpenAI-совместимый upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--name", default=None, help="Имя эндпоинта в ответах")
+    parser.add_argument("--delay", type=float, default=0.2, help="Задержка ответа в секундах")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Разброс задержки в секундах")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--yes-rate", type=float, default=0.2, help="Доля ответов 'да' на проверку перехода")
+    args = parser.parse_args()
+
+    name = args.name or f"fake-{args.port}"
+    handler = make_handler(name, args.delay, args.jitter, args.error_rate, args.yes_rate)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"{name} listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -1,18 +1,23 @@
 import os 
 import pathlib
-import yaml 
 import numpy as np
 
+def config_path():
+    """Полный путь к config.yaml (по умолчанию в корне проекта, либо из VIRTUAL_TUTOR_CONFIG)"""
+    default_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(), "config.yaml")
+    return os.environ.get("VIRTUAL_TUTOR_CONFIG", default_path)
+
 def load_config():
     """
-    Загружает конфигурацию из файла config.yaml в корне проекта.
+    Читает config.yaml с диска (без кэша).
+    Для обычного доступа к конфигурации используйте settings.get_settings().
     
     Returns:
         dict: Загруженная конфигурация
     """
-    # Полный путь к config.yaml
-    conf_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(), "config.yaml")
-    with open(conf_path, 'r') as conf_file:
+    import yaml
+
+    with open(config_path(), 'r', encoding='utf-8') as conf_file:
         return yaml.load(conf_file, Loader=yaml.FullLoader)
 
 # Пространства интенций для 4 этапов:
@@ -78,6 +83,26 @@ from1to2 = '''Согласие начать урок получено. Можн
 from2to3 = '''Ученик написал outline, можно переходить к написанию самого эссе - 3 этап.\n'''
 from3to4 = '''Эссе написано. Можно перейти к этапу финальной оценки - 4 этап\n'''
 
+# Критерии правильного написания эссе (те же, что в start_promt_dvt):
+essay_criteria = {
+    'a': 'Содержание эссе соответствует его названию (которое является первой строкой эссе)',
+    'b': 'Тема достаточно раскрыта',
+    'c': 'Основные моменты хорошо выбраны',
+    'd': 'Аргументы обоснованы',
+    'e': 'Работа завершена',
+    'f': 'Организация эссе правильная',
+    'g': 'Написание имеет смысл, является непрерывным и логически последовательным',
+    'h': 'Изложена собственная точка зрения автора',
+    'i': 'Определение предмета с интуитивными объяснениями',
+    'j': 'Обсуждение предыстории и связанных тем',
+    'k': 'Обсуждение вопросов или проблем и существующих решений',
+    'l': 'Характеристика современного состояния дел',
+    'm': 'Описание методологий или технических деталей',
+    'n': 'Обсуждение широкого влияния на технологию/общество',
+    'o': 'Обсуждение будущих тенденций и перспектив',
+    'p': 'Выводы, итоговый или выводной материал'
+}
+
 # Системные промпты:
 
 start_promt = """
@@ -1,55 +1,46 @@
 import numpy as np
 import re
-import requests
 import json
 import helper as hlp
-import time
+import threading
+import routing
 
 class Interface:
     """Класс для взаимодействия с Deepseek API"""
     
     def __init__(self):
-        """Инициализация с загрузкой конфигурации"""
-        config = hlp.load_config()
-        self.token = config["auth"]["token"]  # API-ключ
-        self.base_url = config["auth"]["url"].rstrip('/')  # Базовый URL API
-        self.headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
-        }
-        self.timeout = 30  # Таймаут запроса в секундах
-        self.max_retries = 3  # Максимальное количество попыток
+        """Инициализация с общим роутером эндпоинтов из конфигурации"""
+        self.router = routing.get_router()  # Выбор эндпоинта и модели для каждого вызова
+        self._local = threading.local()  # Данные последнего запроса в текущем потоке
 
-    def _make_api_request(self, endpoint, body):
+    def _make_api_request(self, endpoint, body, call_type):
         """
-        Внутренний метод для отправки запросов с повторными попытками
+        Внутренний метод для отправки запросов через роутер эндпоинтов
         
         Args:
             endpoint (str): Конечная точка API (например "/chat/completions")
-            body (dict): Тело запроса
+            body (dict): Тело запроса (модель подставляет выбранный эндпоинт)
+            call_type (str): Тип вызова для выбора эндпоинта (routing.CALL_TYPES)
             
         Returns:
             dict: Ответ API или None при ошибке
         """
-        url = f"{self.base_url}{endpoint}"
-        
-        for attempt in range(self.max_retries):
-            try:
-                response = requests.post(
-                    url=url,
-                    headers=self.headers,
-                    json=body,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()  # Проверка на ошибки HTTP
-                return response.json()
-            except requests.exceptions.Timeout:
-                if attempt == self.max_retries - 1:
-                    raise  # Если последняя попытка - пробрасываем исключение
-                time.sleep(1)  # Задержка между попытками
-            except requests.exceptions.RequestException:
-                return None
-        return None
+        # Неудачный запрос не должен отчитываться токенами предыдущего
+        self._local.usage = {}
+        result = self.router.request(call_type, endpoint, body)
+        if result:
+            self._local.usage = result.get("usage") or {}
+        return result
+
+    def last_usage_tokens(self):
+        """
+        Количество токенов последнего запроса в текущем потоке (0 после ошибки)
+
+        Returns:
+            int: total_tokens из поля usage ответа API (0, если неизвестно)
+        """
+        usage = getattr(self._local, "usage", None) or {}
+        return int(usage.get("total_tokens", 0))
 
     def clear_intentions(self, reply):
         """
@@ -87,12 +78,11 @@ class Interface:
         """
         
         body = {
-            'model': 'deepseek-chat',
             'messages': [{'role': 'user', 'content': prompt}],
             'temperature': 0.1  # Низкая температура для детерминированных ответов
         }
 
-        result = self._make_api_request("/chat/completions", body)
+        result = self._make_api_request("/chat/completions", body, "composition")
         if result:
             return self.clear_intentions(result["choices"][0]["message"]["content"])
         return None
@@ -106,8 +96,8 @@ class Interface:
             messages (list): История диалога
             intens_dict (dict): Словарь интенций
             feelings (np.array): Вектор эмоций
-            prev_scheme (int): Предыдущий этап
-            current_scheme (int): Текущий этап
+            prev_scheme (int): Этап до проверки перехода (0-3)
+            current_scheme (int): Текущий этап (0-3)
             
         Returns:
             str: Ответ тьютора или сообщение об ошибке
@@ -125,11 +115,11 @@ class Interface:
         # Добавляем сообщение о переходе между этапами
         transition_msg = ""
         if current_scheme - prev_scheme == 1:
-            if current_scheme == 2:
+            if current_scheme == 1:
                 transition_msg = hlp.from1to2
-            elif current_scheme == 3:
+            elif current_scheme == 2:
                 transition_msg = hlp.from2to3
-            elif current_scheme == 4:
+            elif current_scheme == 3:
                 transition_msg = hlp.from3to4
         else:
             transition_msg = f"Вы находитесь на этапе {current_scheme + 1}"
@@ -146,13 +136,12 @@ class Interface:
         messages_opt.append({"role": "user", "content": prompt})
 
         body = {
-            'model': 'deepseek-chat',
             'messages': messages_opt,
             'temperature': 0.7,  # Средняя температура для креативности
             'max_tokens': 300    # Ограничение длины ответа
         }
 
-        result = self._make_api_request("/chat/completions", body)
+        result = self._make_api_request("/chat/completions", body, "replic")
         if result:
             return result["choices"][0]["message"]["content"]
         return "Не удалось получить ответ от API"
@@ -168,17 +157,102 @@ class Interface:
             str: Ответ тьютора или сообщение об ошибке
         """
         body = {
-            'model': 'deepseek-chat',
             'messages': messages,
             'temperature': 0.7,
             'max_tokens': 300
         }
         
-        result = self._make_api_request("/chat/completions", body)
+        result = self._make_api_request("/chat/completions", body, "dummy")
         if result:
             return result["choices"][0]["message"]["content"]
         return "Ошибка соединения с API"
 
+    def parse_verdict(self, reply):
+        """
+        Извлекает JSON-объект из текстового ответа API
+
+        Args:
+            reply (str): Текст ответа (может содержать ```json и пояснения)
+
+        Returns:
+            dict: Разобранный объект или None, если JSON не найден
+        """
+        match = re.search(r"\{.*\}", reply, re.DOTALL)
+        if not match:
+            return None
+        try:
+            verdict = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+        return verdict if isinstance(verdict, dict) else None
+
+    def _get_verdict(self, prompt):
+        """Отправляет короткий запрос на проверку и возвращает JSON-вердикт"""
+        body = {
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': 0.1,
+            'max_tokens': 200    # Вердикт - небольшой JSON
+        }
+
+        result = self._make_api_request("/chat/completions", body, "verdict")
+        if result:
+            return self.parse_verdict(result["choices"][0]["message"]["content"])
+        return None
+
+    def get_section_verdict(self, title, section, position, total, criteria):
+        """
+        Проверяет один раздел эссе по критериям
+
+        Args:
+            title (str): Название эссе (первая строка)
+            section (str): Текст раздела
+            position (int): Номер раздела (с 1)
+            total (int): Количество разделов в эссе
+            criteria (dict): Проверяемые критерии {буква: описание}
+
+        Returns:
+            dict: {"met": [...], "issues": [...], "comment": "..."} или None при ошибке
+        """
+        cr_str = '\n'.join(f"{letter}) {text}" for letter, text in criteria.items())
+        prompt = f"""
+            Ты проверяешь раздел {position} из {total} эссе на тему "{title}".
+            Критерии:
+            {cr_str}
+            Раздел:
+            "{section}"
+            Ответь только JSON-объектом вида
+            {{"met": [буквы критериев, которые выполняются в разделе],
+              "issues": [буквы критериев, которые раздел нарушает],
+              "comment": "1-2 предложения о сильных сторонах и недостатках раздела"}}
+        """
+        return self._get_verdict(prompt)
+
+    def get_structure_verdict(self, title, outline, criteria):
+        """
+        Проверяет структуру эссе по началам разделов
+
+        Args:
+            title (str): Название эссе (первая строка)
+            outline (str): Первые предложения всех разделов по порядку
+            criteria (dict): Проверяемые критерии {буква: описание}
+
+        Returns:
+            dict: {"met": [...], "issues": [...], "comment": "..."} или None при ошибке
+        """
+        cr_str = '\n'.join(f"{letter}) {text}" for letter, text in criteria.items())
+        prompt = f"""
+            Ты проверяешь структуру эссе на тему "{title}".
+            Ниже начала всех разделов эссе по порядку:
+            {outline}
+            Критерии:
+            {cr_str}
+            Ответь только JSON-объектом вида
+            {{"met": [буквы выполненных критериев],
+              "issues": [буквы невыполненных критериев],
+              "comment": "1-2 предложения о структуре эссе"}}
+        """
+        return self._get_verdict(prompt)
+
     def get_brain_status(self, messages, last_message, current_scheme):
         """
         Проверяет условия перехода между этапами
@@ -204,13 +278,12 @@ class Interface:
         messages_opt.append({"role": "user", "content": prompts[current_scheme]})
 
         body = {
-            'model': 'deepseek-chat',
             'messages': messages_opt,
             'temperature': 0.1,  # Низкая температура для бинарных ответов
             'max_tokens': 10     # Ограничение на короткий ответ
         }
 
-        result = self._make_api_request("/chat/completions", body)
+        result = self._make_api_request("/chat/completions", body, "brain")
         if result:
             return result["choices"][0]["message"]["content"].lower().strip()
         return None
\ No newline at end of file
@@ -5,4 +5,10 @@ class TextItem(BaseModel):
     direction: str | None = None
 
 class EmotionItem(BaseModel):
-    direction: str | None = None
\ No newline at end of file
+    direction: str | None = None
+
+# Модель для WebSocket сообщений
+class WssItem(BaseModel):
+    type: str      # Тип сообщения ('chat' или 'essay')
+    content: str   # Текст сообщения
+    timestamp: str # Временная метка ISO
\ No newline at end of file
@@ -0,0 +1,373 @@
+import random
+import threading
+import time
+from typing import get_args
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+import settings as cfg
+
+# Типы вызовов, по которым настраивается привязка моделей (calls в config.yaml)
+CALL_TYPES = get_args(cfg.CallType)
+
+class Endpoint:
+    """Один upstream-эндпоинт с моделью и живой статистикой задержек и ошибок"""
+
+    def __init__(self, name, url, token, model, weight=1.0, calls=None, initial_latency=1.0):
+        """
+        Args:
+            name (str): Имя эндпоинта для логов и статистики
+            url (str): Базовый URL API
+            token (str): API-ключ
+            model (str): Имя модели для запросов
+            weight (float): Вес эндпоинта (больше - чаще выбирается)
+            calls (list, optional): Типы вызовов, которые можно отправлять сюда. None - любые
+            initial_latency (float): Начальная оценка задержки в секундах
+        """
+        self.name = name
+        self.url = url.rstrip('/')
+        self.model = model
+        self.weight = weight
+        self.calls = set(calls) if calls else None
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        self.lock = threading.Lock()
+        self.latency = initial_latency   # EWMA задержки
+        self.error_rate = 0.0            # EWMA доли ошибок
+        self.samples = deque(maxlen=200) # Последние задержки успешных запросов для p95
+
+    def accepts(self, call_type):
+        """Можно ли отправлять сюда вызов данного типа"""
+        return self.calls is None or call_type in self.calls
+
+    def observe(self, latency, ok, alpha):
+        """
+        Обновляет EWMA задержки и ошибок
+
+        Args:
+            latency (float): Длительность запроса в секундах
+            ok (bool): Успешен ли запрос
+            alpha (float): Коэффициент сглаживания EWMA
+        """
+        with self.lock:
+            self.latency = (1 - alpha) * self.latency + alpha * latency
+            self.error_rate = (1 - alpha) * self.error_rate + alpha * (0.0 if ok else 1.0)
+            if ok:
+                self.samples.append(latency)
+
+    def p95(self, default):
+        """95-й перцентиль задержки или default, пока данных мало"""
+        with self.lock:
+            if len(self.samples) < 10:
+                return default
+            ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def score(self, error_penalty):
+        """Оценка для выбора: меньше - лучше"""
+        with self.lock:
+            return self.latency * (1 + error_penalty * self.error_rate) / self.weight
+
+    def post(self, path, body, timeout):
+        """
+        Отправляет запрос с моделью этого эндпоинта
+
+        Returns:
+            dict: Ответ API (исключения requests пробрасываются)
+        """
+        response = requests.post(
+            url=f"{self.url}{path}",
+            headers=self.headers,
+            json=dict(body, model=self.model),
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+def _is_client_error(error):
+    """Ошибка в самом запросе (4xx, кроме 429), которую не исправит другой эндпоинт"""
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500 and response.status_code != 429
+
+def endpoints_from_settings(settings):
+    """
+    Создает эндпоинты из конфигурации
+
+    Args:
+        settings (Settings): Конфигурация процесса
+
+    Returns:
+        list: Endpoint в порядке config.yaml
+    """
+    if not settings.endpoints:
+        return [Endpoint("default", settings.auth.url, settings.auth.token, "deepseek-chat")]
+    return [
+        Endpoint(
+            name=conf.name or conf.url,
+            url=conf.url,
+            token=conf.token or settings.auth.token,
+            model=conf.model,
+            weight=conf.weight,
+            calls=conf.calls
+        )
+        for conf in settings.endpoints
+    ]
+
+class Router:
+    """
+    Выбор эндпоинта по типу вызова и EWMA задержки/ошибок,
+    хеджирование критичных по задержке вызовов
+    """
+
+    def __init__(self, endpoints, alpha=0.2, error_penalty=5.0, explore=0.05,
+                 hedge_calls=("replic", "dummy"), hedge_default_delay=3.0, hedge_min_delay=0.3,
+                 timeout=30, max_retries=3):
+        """
+        Args:
+            endpoints (list): Список Endpoint
+            alpha (float): Коэффициент сглаживания EWMA
+            error_penalty (float): Во сколько раз ошибки ухудшают оценку эндпоинта
+            explore (float): Доля запросов на случайный (по весам) эндпоинт для обновления статистики
+            hedge_calls (tuple): Типы вызовов, для которых отправляется резервный запрос
+            hedge_default_delay (float): Задержка резервного запроса, пока нет статистики p95
+            hedge_min_delay (float): Минимальная задержка резервного запроса
+            timeout (int): Таймаут запроса в секундах
+            max_retries (int): Максимальное количество попыток
+        """
+        self.endpoints = endpoints
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.explore = explore
+        self.hedge_calls = set(hedge_calls)
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.lock = threading.Lock()  # Счетчики обновляются из потоков запросов
+        self.hedges = 0      # Отправлено резервных запросов
+        self.hedge_wins = 0  # Резервный запрос ответил первым
+        self.executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="upstream")
+
+    @staticmethod
+    def _options(settings):
+        """Параметры роутера из секции routing"""
+        routing = settings.routing
+        return dict(
+            alpha=routing.ewma_alpha,
+            error_penalty=routing.error_penalty,
+            explore=routing.explore,
+            hedge_calls=routing.hedge_calls,
+            hedge_default_delay=routing.hedge_default_delay,
+            hedge_min_delay=routing.hedge_min_delay,
+            timeout=routing.timeout,
+            max_retries=routing.max_retries
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Создает роутер из конфигурации: секция endpoints, либо auth для одного эндпоинта
+
+        Args:
+            settings (Settings): Конфигурация процесса
+
+        Returns:
+            Router: Настроенный роутер
+        """
+        return cls(endpoints_from_settings(settings), **cls._options(settings))
+
+    def apply_settings(self, settings):
+        """
+        Применяет новую конфигурацию без пересоздания роутера: статистика
+        сохраняется для эндпоинтов с теми же именем, URL и моделью
+
+        Args:
+            settings (Settings): Новая конфигурация
+        """
+        previous = {(e.name, e.url, e.model): e for e in self.endpoints}
+        endpoints = []
+        for endpoint in endpoints_from_settings(settings):
+            old = previous.get((endpoint.name, endpoint.url, endpoint.model))
+            if old is not None:
+                # Тот же объект: запросы в полете продолжают писать статистику под его lock
+                old.weight, old.calls, old.headers = endpoint.weight, endpoint.calls, endpoint.headers
+                endpoint = old
+            endpoints.append(endpoint)
+
+        options = self._options(settings)
+        self.alpha = options["alpha"]
+        self.error_penalty = options["error_penalty"]
+        self.explore = options["explore"]
+        self.hedge_calls = set(options["hedge_calls"])
+        self.hedge_default_delay = options["hedge_default_delay"]
+        self.hedge_min_delay = options["hedge_min_delay"]
+        self.timeout = options["timeout"]
+        self.max_retries = options["max_retries"]
+        self.endpoints = endpoints
+
+    def _matching(self, call_type):
+        """Эндпоинты, принимающие тип вызова (все, если таких нет)"""
+        return [e for e in self.endpoints if e.accepts(call_type)] or list(self.endpoints)
+
+    def candidates(self, call_type, exclude=()):
+        """
+        Эндпоинты для типа вызова, от лучшего к худшему
+
+        Args:
+            call_type (str): Тип вызова
+            exclude (set): Эндпоинты, уже не ответившие в этом запросе
+
+        Returns:
+            list: Отсортированные по оценке эндпоинты
+        """
+        matching = self._matching(call_type)
+        fresh = [e for e in matching if e not in exclude] or matching
+        ranked = sorted(fresh, key=lambda e: e.score(self.error_penalty))
+        if len(ranked) > 1 and random.random() < self.explore:
+            # Исследование: иногда выбираем эндпоинт случайно по весам
+            chosen = random.choices(ranked, weights=[e.weight for e in ranked])[0]
+            ranked.remove(chosen)
+            ranked.insert(0, chosen)
+        return ranked
+
+    def _attempt(self, endpoint, path, body):
+        """Один запрос к эндпоинту с учетом задержки и результата в статистике"""
+        started = time.monotonic()
+        try:
+            result = endpoint.post(path, body, self.timeout)
+        except requests.exceptions.RequestException:
+            endpoint.observe(time.monotonic() - started, False, self.alpha)
+            raise
+        endpoint.observe(time.monotonic() - started, True, self.alpha)
+        return result
+
+    def _start_now(self, endpoint, path, body):
+        """
+        Запускает запрос в отдельном потоке сразу, без очереди общего пула:
+        время ожидания в очереди не должно засчитываться в задержку хеджирования
+
+        Returns:
+            Future: Результат _attempt
+        """
+        future = Future()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(self._attempt(endpoint, path, body))
+            except BaseException as error:
+                future.set_exception(error)
+
+        threading.Thread(target=run, name="upstream-primary", daemon=True).start()
+        return future
+
+    def _hedged(self, ranked, path, body, failed):
+        """
+        Запрос к лучшему эндпоинту; если он не ответил за p95, параллельно
+        отправляется резервный запрос ко второму (через пул). Побеждает первый
+        успешный ответ, проигравший отменяется (уже начатый запрос дорабатывает
+        в фоне и учитывается только в статистике)
+
+        Args:
+            failed (set): Сюда добавляются все эндпоинты, ответившие ошибкой
+        """
+        primary, backup = ranked[0], ranked[1]
+        delay = max(self.hedge_min_delay, primary.p95(self.hedge_default_delay))
+        futures = {self._start_now(primary, path, body): primary}
+
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            with self.lock:
+                self.hedges += 1
+            futures[self.executor.submit(self._attempt, backup, path, body)] = backup
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if futures[future] is backup:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+                failed.add(futures[future])
+        raise error
+
+    def request(self, call_type, path, body):
+        """
+        Отправляет запрос с выбором эндпоинта и переключением при ошибках
+
+        Args:
+            call_type (str): Тип вызова (из CALL_TYPES)
+            path (str): Конечная точка API (например "/chat/completions")
+            body (dict): Тело запроса без модели
+
+        Returns:
+            dict: Ответ API или None при ошибке (таймаут последней попытки пробрасывается)
+        """
+        failed = set()
+        last_error = None
+        for attempt in range(self.max_retries):
+            ranked = self.candidates(call_type, failed)
+            try:
+                if call_type in self.hedge_calls and len(ranked) > 1:
+                    return self._hedged(ranked, path, body, failed)
+                return self._attempt(ranked[0], path, body)
+            except requests.exceptions.Timeout as error:
+                last_error = error
+                failed.add(ranked[0])
+                if len(ranked) == 1:
+                    time.sleep(1)  # Задержка перед повтором на том же эндпоинте
+            except requests.exceptions.RequestException as error:
+                # Как и с одним эндпоинтом: ошибка запроса (4xx) не повторяется,
+                # остальные ошибки переключают на еще не пробованный эндпоинт, если он есть
+                failed.add(ranked[0])
+                if _is_client_error(error) or all(e in failed for e in self._matching(call_type)):
+                    return None
+        if isinstance(last_error, requests.exceptions.Timeout):
+            raise last_error  # Все попытки завершились таймаутом
+        return None
+
+    def report(self):
+        """
+        Текущая статистика эндпоинтов
+
+        Returns:
+            dict: Задержки, ошибки и p95 по эндпоинтам, счетчики хеджирования
+        """
+        with self.lock:
+            hedges, hedge_wins = self.hedges, self.hedge_wins
+        return {
+            "endpoints": {
+                e.name: {
+                    "model": e.model,
+                    "weight": e.weight,
+                    "latency_ewma": e.latency,
+                    "error_ewma": e.error_rate,
+                    "p95": e.p95(None)
+                }
+                for e in self.endpoints
+            },
+            "hedges": hedges,
+            "hedge_wins": hedge_wins
+        }
+
+# Общий роутер процесса: статистика накапливается между сессиями
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """Возвращает общий роутер, создавая его из конфигурации при первом обращении"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = Router.from_settings(cfg.get_settings())
+            # Изменения config.yaml применяются к уже работающим сессиям
+            cfg.on_reload(_router.apply_settings)
+        return _router
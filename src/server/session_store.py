@@ -0,0 +1,119 @@
+import json
+import os
+import pathlib
+import time
+import settings as cfg
+
+def checkpoint_dir():
+    """Папка контрольных точек (относительный путь считается от корня проекта)"""
+    root = pathlib.Path(__file__).parent.parent.parent.absolute()
+    return os.path.join(root, cfg.get_settings().drain.checkpoint_dir)
+
+def checkpoint_path(kind, client_id):
+    """Путь к файлу контрольной точки сессии"""
+    return os.path.join(checkpoint_dir(), f"{kind}_{client_id}.json")
+
+def save_checkpoint(kind, client_id, data):
+    """
+    Атомарно сохраняет состояние сессии
+
+    Args:
+        kind (str): Тип тьютора ('dummy' или 'moral')
+        client_id (int): ID сессии
+        data (dict): Состояние из checkpoint() тьютора
+    """
+    os.makedirs(checkpoint_dir(), exist_ok=True)
+    path = checkpoint_path(kind, client_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+class CheckpointClaim:
+    """
+    Забранная контрольная точка: файл удаляется только после успешного
+    восстановления сессии, при ошибке возвращается на место
+    """
+
+    def __init__(self, path, claimed_path, data):
+        """
+        Args:
+            path (str): Исходный путь контрольной точки
+            claimed_path (str): Путь переименованного файла (None - точки нет)
+            data (dict): Состояние сессии или None
+        """
+        self.path = path
+        self.claimed_path = claimed_path
+        self.data = data
+
+    def commit(self):
+        """Сессия восстановлена - файл больше не нужен"""
+        if self.claimed_path is not None:
+            try:
+                os.remove(self.claimed_path)
+            except OSError:
+                pass  # Уже удален при очистке устаревших точек
+            self.claimed_path = None
+
+    def release(self):
+        """Восстановление не удалось - файл возвращается для следующей попытки"""
+        if self.claimed_path is not None:
+            try:
+                os.replace(self.claimed_path, self.path)
+            except OSError:
+                pass  # Уже удален при очистке устаревших точек
+            self.claimed_path = None
+
+def claim_checkpoint(kind, client_id):
+    """
+    Забирает состояние сессии: файл переименовывается перед чтением,
+    поэтому при одновременном подключении к двум процессам его получит только один
+
+    Args:
+        kind (str): Тип тьютора ('dummy' или 'moral')
+        client_id (int): ID сессии
+
+    Returns:
+        CheckpointClaim: Забранная точка (data - None, если точки нет или она не читается)
+    """
+    path = checkpoint_path(kind, client_id)
+    claimed = f"{path}.{os.getpid()}.claimed"
+    try:
+        os.rename(path, claimed)
+    except OSError:
+        return CheckpointClaim(path, None, None)
+    claim = CheckpointClaim(path, claimed, None)
+    try:
+        with open(claimed, "r", encoding="utf-8") as f:
+            claim.data = json.load(f)
+    except (OSError, ValueError):
+        claim.release()  # Нечитаемый файл остается до истечения срока хранения
+    return claim
+
+def remove_expired(ttl):
+    """
+    Удаляет контрольные точки (и незавершенные временные файлы), которые
+    никто не забрал за ttl секунд
+
+    Args:
+        ttl (float): Срок хранения в секундах
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    directory = checkpoint_dir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    removed = 0
+    expire_before = time.time() - ttl
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < expire_before:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass  # Файл уже забран или удален другим процессом
+    return removed
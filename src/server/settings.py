@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+import helper as hlp
+
+logger = logging.getLogger("settings")
+
+class FrozenModel(BaseModel):
+    """Неизменяемая часть конфигурации; неизвестные ключи считаются ошибкой"""
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+# Типы вызовов, по которым настраивается привязка моделей (routing.CALL_TYPES)
+CallType = Literal["composition", "brain", "replic", "dummy", "verdict"]
+
+class AuthSettings(FrozenModel):
+    url: str    # URL API по умолчанию
+    token: str  # API-ключ по умолчанию
+
+class EndpointSettings(FrozenModel):
+    url: str
+    name: str | None = None
+    token: str | None = None   # None - берется из auth
+    model: str = "deepseek-chat"
+    weight: float = Field(default=1.0, gt=0)
+    calls: tuple[CallType, ...] | None = None  # None - любые типы вызовов
+
+class RoutingSettings(FrozenModel):
+    ewma_alpha: float = Field(default=0.2, ge=0, le=1)
+    error_penalty: float = Field(default=5.0, ge=0)
+    explore: float = Field(default=0.05, ge=0, le=1)
+    hedge_calls: tuple[CallType, ...] = ("replic", "dummy")
+    hedge_default_delay: float = Field(default=3.0, ge=0)
+    hedge_min_delay: float = Field(default=0.3, ge=0)
+    timeout: float = Field(default=30, gt=0)
+    max_retries: int = Field(default=3, ge=1)
+
+class HostSettings(FrozenModel):
+    host: str
+    port: int
+    ws_root: str | None = None
+
+class RunningSettings(FrozenModel):
+    local: HostSettings
+    server: HostSettings
+
+class StaticSettings(FrozenModel):
+    dev: bool = False  # Читается только при запуске сервера
+
+class DrainSettings(FrozenModel):
+    checkpoint_dir: str = "checkpoints"  # Относительно корня проекта
+    deadline: float = 20.0  # Ожидание текущих ходов при остановке (сек)
+    admin_token: str | None = None  # Токен POST /admin/drain; None - эндпоинт отключен
+    checkpoint_ttl: float = Field(default=86400.0, gt=0)  # Срок хранения незабранных точек (сек)
+
+class Settings(FrozenModel):
+    """Конфигурация из config.yaml"""
+    auth: AuthSettings
+    endpoints: tuple[EndpointSettings, ...] = ()
+    routing: RoutingSettings = RoutingSettings()
+    static: StaticSettings = StaticSettings()
+    drain: DrainSettings = DrainSettings()
+    speculative_replies: bool = True
+    run_mode: Literal["local", "server"] = "local"
+    running: RunningSettings
+
+# Общая конфигурация процесса
+_settings = None
+_lock = threading.Lock()
+_callbacks = []
+_watcher = None  # (поток слежения, событие остановки)
+
+def load_settings():
+    """
+    Читает и валидирует config.yaml
+
+    Returns:
+        Settings: Новая конфигурация (ошибки чтения и валидации пробрасываются)
+    """
+    return Settings.model_validate(hlp.load_config())
+
+def get_settings():
+    """Возвращает общую конфигурацию, загружая ее при первом обращении"""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = load_settings()
+    return _settings
+
+def on_reload(callback):
+    """
+    Подписывает функцию на изменение конфигурации
+
+    Args:
+        callback (callable): Вызывается с новым Settings после успешной перезагрузки
+    """
+    _callbacks.append(callback)
+
+def reload_settings():
+    """
+    Перечитывает config.yaml; при ошибке остается прежняя конфигурация
+
+    Returns:
+        bool: Применена ли новая конфигурация
+    """
+    global _settings
+    try:
+        new_settings = load_settings()
+    except (OSError, ValueError, ValidationError) as error:
+        logger.error(f"config.yaml не применен: {error}")
+        return False
+
+    with _lock:
+        if new_settings == _settings:
+            return False
+        _settings = new_settings
+    for callback in _callbacks:
+        callback(new_settings)
+    logger.warning("config.yaml перезагружен")
+    return True
+
+def _watch(path, stop_event, interval):
+    """Следит за файлом конфигурации (watchfiles, если установлен, иначе опрос mtime)"""
+    try:
+        from watchfiles import watch
+    except ImportError:
+        watch = None
+
+    if watch is not None:
+        # Следим за папкой: редакторы сохраняют файл заменой (os.replace),
+        # и слежение за самим файлом теряется после первого сохранения
+        name = os.path.basename(path)
+        only_config = lambda change, changed_path: os.path.basename(changed_path) == name
+        for _ in watch(os.path.dirname(path), watch_filter=only_config, stop_event=stop_event):
+            reload_settings()
+        return
+
+    last_mtime = os.path.getmtime(path)
+    while not stop_event.wait(interval):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if mtime != last_mtime:
+            last_mtime = mtime
+            reload_settings()
+
+def start_watcher(interval=1.0):
+    """
+    Запускает фоновую перезагрузку config.yaml при изменении файла
+
+    Args:
+        interval (float): Период опроса mtime, если watchfiles не установлен
+    """
+    global _watcher
+    if _watcher is not None:
+        return
+    get_settings()
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=_watch, args=(hlp.config_path(), stop_event, interval),
+        name="config-watcher", daemon=True)
+    thread.start()
+    _watcher = (thread, stop_event)
+
+def stop_watcher(timeout=5.0):
+    """Останавливает слежение за config.yaml и дожидается завершения потока"""
+    global _watcher
+    if _watcher is None:
+        return
+    thread, stop_event = _watcher
+    stop_event.set()
+    thread.join(timeout)
+    _watcher = None
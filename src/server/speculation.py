@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class SpeculationStats:
+    """Статистика спекулятивной генерации ответов по этапам"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}  # Этап -> счетчики
+
+    def _stage(self, stage):
+        """Счетчики этапа (создаются при первом обращении)"""
+        return self.stages.setdefault(stage, {
+            "hits": 0,            # Этап не изменился, ответ принят
+            "misses": 0,          # Этап изменился, ответ сгенерирован заново
+            "skipped": 0,         # Нет свободного потока - ответ сгенерирован последовательно
+            "saved_sec": 0.0,     # Сэкономленное время на попаданиях
+            "wasted_tokens": 0    # Токены отброшенных ответов
+        })
+
+    def record_hit(self, stage, saved_sec):
+        """
+        Учитывает принятый спекулятивный ответ
+
+        Args:
+            stage (int): Этап, на котором сгенерирован ответ
+            saved_sec (float): Время, сэкономленное за счет параллельного запуска
+        """
+        with self.lock:
+            counters = self._stage(stage)
+            counters["hits"] += 1
+            counters["saved_sec"] += max(0.0, saved_sec)
+
+    def record_miss(self, stage, wasted_tokens):
+        """
+        Учитывает отброшенный спекулятивный ответ
+
+        Args:
+            stage (int): Этап, на котором сгенерирован ответ
+            wasted_tokens (int): Токены, потраченные на отброшенный ответ
+        """
+        with self.lock:
+            counters = self._stage(stage)
+            counters["misses"] += 1
+            counters["wasted_tokens"] += wasted_tokens
+
+    def record_skip(self, stage):
+        """
+        Учитывает ход без спекуляции из-за занятого пула
+
+        Args:
+            stage (int): Этап хода
+        """
+        with self.lock:
+            self._stage(stage)["skipped"] += 1
+
+    def report(self):
+        """
+        Сводка по этапам
+
+        Returns:
+            dict: {этап: {hits, misses, skipped, hit_rate, saved_sec, wasted_tokens}}
+        """
+        with self.lock:
+            report = {}
+            for stage, counters in sorted(self.stages.items()):
+                total = counters["hits"] + counters["misses"]
+                report[stage] = dict(counters, hit_rate=counters["hits"] / total if total else 0.0)
+            return report
+
+# Общая статистика процесса
+stats = SpeculationStats()
+
+# Пул потоков для спекулятивных ответов размером с пул run_in_threadpool (anyio):
+# каждый ход может спекулировать, не дожидаясь очереди
+MAX_WORKERS = 40
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="speculative")
+_slots = threading.BoundedSemaphore(MAX_WORKERS)
+
+def submit(fn):
+    """
+    Запускает спекулятивный ответ, только если есть свободный поток: ожидание
+    за отброшенными ответами других сессий было бы медленнее последовательного пути
+
+    Args:
+        fn (callable): Генерация ответа
+
+    Returns:
+        Future: Задача или None, если все потоки заняты
+    """
+    if not _slots.acquire(blocking=False):
+        return None
+    future = executor.submit(fn)
+    # Поток освобождается и после отмены, и после завершения отброшенного запроса
+    future.add_done_callback(lambda _: _slots.release())
+    return future
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+
+try:
+    import brotli  # Необязательная зависимость: без нее отдаются только gzip-варианты
+except ImportError:
+    brotli = None
+
+# Заголовки кэширования
+IMMUTABLE = "public, max-age=31536000, immutable"  # Ассеты с хэшем в имени
+REVALIDATE = "no-cache"                            # HTML и исходные имена - проверка по ETag
+
+class Asset:
+    """Подготовленный файл интерфейса со сжатыми вариантами"""
+
+    def __init__(self, body, media_type, cache_control):
+        """
+        Args:
+            body (bytes): Содержимое файла
+            media_type (str): MIME-тип
+            cache_control (str): Значение заголовка Cache-Control
+        """
+        self.media_type = media_type
+        self.cache_control = cache_control
+        # Слабый ETag: одно значение для всех вариантов сжатия
+        self.etag = 'W/"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+
+        # Сжатые варианты строятся один раз и хранятся, только если они меньше исходного
+        self.variants = {"identity": body}
+        compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.variants[encoding] = data
+
+    def pick_encoding(self, accept_encoding):
+        """
+        Выбирает лучший доступный вариант по заголовку Accept-Encoding
+
+        Args:
+            accept_encoding (str): Значение заголовка запроса
+
+        Returns:
+            str: "br", "gzip" или "identity"
+        """
+        accepted = set()
+        for token in accept_encoding.split(","):
+            name, _, params = token.strip().partition(";")
+            if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(name.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Раздача интерфейса из памяти: ассеты с хэшем содержимого в URL кэшируются
+    навсегда, HTML ссылается на них и проверяется по ETag, brotli/gzip готовятся при старте
+    """
+
+    def __init__(self, directory, html=True):
+        """
+        Args:
+            directory (str): Папка интерфейса
+            html (bool): Отдавать index.html для папок
+        """
+        super().__init__(directory=directory, html=html)
+        self.assets = {}  # Путь относительно папки -> Asset
+        self._build(directory)
+
+    def _build(self, directory):
+        """Читает файлы папки, добавляет хэшированные имена и переписывает ссылки в HTML"""
+        hashed = {}  # Исходное имя -> имя с хэшем
+        pages = {}
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                full_path = os.path.join(root, file_name)
+                rel_path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    body = f.read()
+                media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+                if file_name.endswith(".html"):
+                    pages[rel_path] = (body, media_type)
+                    continue
+
+                stem, ext = os.path.splitext(rel_path)
+                digest = hashlib.sha256(body).hexdigest()[:10]
+                hashed[rel_path] = f"{stem}.{digest}{ext}"
+                self.assets[hashed[rel_path]] = Asset(body, media_type, IMMUTABLE)
+                # Исходное имя остается доступным для старых ссылок
+                self.assets[rel_path] = Asset(body, media_type, REVALIDATE)
+
+        for rel_path, (body, media_type) in pages.items():
+            text = body.decode("utf-8")
+            base = os.path.dirname(rel_path)
+            for original, target in hashed.items():
+                if os.path.dirname(original) != base:
+                    continue
+                name = os.path.basename(original)
+                pattern = r'((?:href|src)=["\'])(?:\./)?' + re.escape(name) + r'(["\'])'
+                text = re.sub(pattern, lambda m: m.group(1) + os.path.basename(target) + m.group(2), text)
+            self.assets[rel_path] = Asset(text.encode("utf-8"), media_type, REVALIDATE)
+
+    async def get_response(self, path, scope):
+        """Отдает подготовленный ассет или передает запрос стандартной StaticFiles"""
+        key = path.replace(os.sep, "/")
+        if key == ".":
+            key = ""
+        if self.html and (key == "" or key + "/index.html" in self.assets):
+            # Папку без завершающего "/" перенаправляет StaticFiles
+            if not scope["path"].endswith("/"):
+                return await super().get_response(path, scope)
+            key = f"{key}/index.html" if key else "index.html"
+
+        asset = self.assets.get(key)
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        response_headers = {
+            "Cache-Control": asset.cache_control,
+            "ETag": asset.etag,
+            "Vary": "Accept-Encoding"
+        }
+        if asset.etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=response_headers)
+
+        encoding = asset.pick_encoding(headers.get("accept-encoding", ""))
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=response_headers)
@@ -1,91 +1,348 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, TypeAdapter
+from pydantic import ValidationError
+from request_contracts import WssItem
+from wss_codec import WssCodec
 from virtual_tutor import VirtualTutor, DummyVirtualTutor
-import helper as hlp
+from static_assets import PrecompressedStaticFiles
+import routing
+import settings as cfg
+import session_store
+import speculation
 import uvicorn
-import json
+import asyncio
+import logging
+import secrets
+import signal
+import threading
+import time
 import os
 
+logger = logging.getLogger("test_server")
+
 # Кастомный класс для отключения кэширования статических файлов
 class StaticFilesWithoutCaching(StaticFiles):
     def is_not_modified(self, *args, **kwargs) -> bool:
         """Всегда возвращает False, отключая кэширование"""
         return False
 
-# Модель для WebSocket сообщений
-class WssItem(BaseModel):
-    type: str      # Тип сообщения ('chat' или 'essay')
-    content: str   # Текст сообщения
-    timestamp: str # Временная метка ISO
+def install_drain_on_signal():
+    """
+    Перехватывает SIGTERM/SIGINT: сначала передает сессии, затем вызывает прежний
+    обработчик (uvicorn). Иначе uvicorn закрывает соединения до того, как ходы завершатся
+
+    Returns:
+        dict: Прежние обработчики для восстановления при остановке
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return {}  # Сигналы доступны только в главном потоке (например, не в TestClient)
+    loop = asyncio.get_running_loop()
+    previous = {}
+
+    async def drain_then_exit(sig):
+        try:
+            await manager.drain(cfg.get_settings().drain.deadline)
+        finally:
+            previous[sig](sig, None)
+
+    def start_drain(sig):
+        task = loop.create_task(drain_then_exit(sig))
+        manager.tasks.add(task)
+        task.add_done_callback(manager.tasks.discard)
+
+    def handle_signal(sig, frame):
+        if manager.draining:
+            # Повторный сигнал или сигнал после /admin/drain - сразу к остановке uvicorn
+            previous[sig](sig, frame)
+            return
+        manager.draining = True
+        loop.call_soon_threadsafe(start_drain, sig)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        if callable(signal.getsignal(sig)):
+            previous[sig] = signal.signal(sig, handle_signal)
+    return previous
 
-app = FastAPI()
+async def remove_expired_checkpoints():
+    """Периодически удаляет контрольные точки, которые никто не забрал за drain.checkpoint_ttl"""
+    while True:
+        ttl = cfg.get_settings().drain.checkpoint_ttl
+        await run_in_threadpool(session_store.remove_expired, ttl)
+        await asyncio.sleep(min(ttl, 3600))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Следит за config.yaml, пока работает сервер; по сигналу остановки передает сессии"""
+    cfg.start_watcher()
+    previous = install_drain_on_signal()
+    cleanup = asyncio.create_task(remove_expired_checkpoints())
+    yield
+    cleanup.cancel()
+    for sig, handler in previous.items():
+        signal.signal(sig, handler)
+    cfg.stop_watcher()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def read_root():
     """Корневой endpoint для проверки работы сервера"""
     return {"message": "Welcome to the Virtual Tutor Server!"}
 
+@app.get("/stats/speculation")
+def read_speculation_stats():
+    """Статистика спекулятивной генерации ответов по этапам"""
+    return speculation.stats.report()
+
+@app.get("/stats/routing")
+def read_routing_stats():
+    """Задержки и ошибки upstream-эндпоинтов, счетчики хеджирования"""
+    return routing.get_router().report()
+
+# Типы тьюторов по endpoint'ам
+TUTORS = {"dummy": DummyVirtualTutor, "moral": VirtualTutor}
+
+# Коды закрытия WebSocket
+CLOSE_NORMAL = 1000           # Клиент завершил сессию сам
+CLOSE_INTERNAL_ERROR = 1011   # Обработчик завершился с ошибкой
+CLOSE_SERVICE_RESTART = 1012  # Сервер перезапускается - клиент переподключается
+CLOSE_TRY_AGAIN_LATER = 1013  # Сервер не принимает новые сессии
+
+class Session:
+    """Сессия одного WebSocket-соединения"""
+
+    def __init__(self, kind, client_id, tutor, websocket, codec, last_turn=None):
+        self.kind = kind            # Тип тьютора ('dummy' или 'moral')
+        self.client_id = client_id
+        self.tutor = tutor
+        self.websocket = websocket
+        self.codec = codec
+        self.busy = False           # Сейчас генерируется ответ (состояние тьютора меняется)
+        self.handed_off = False     # Состояние сохранено для другого процесса
+        # Последний ход {"timestamp", "content", "reply"}: повтор того же сообщения
+        # после переподключения получает сохраненный ответ без повторной генерации
+        self.last_turn = last_turn
+
+    def replay(self, data_model: WssItem) -> str | None:
+        """Сохраненный ответ, если клиент повторил уже обработанное сообщение"""
+        turn = self.last_turn
+        if turn and turn["timestamp"] == data_model.timestamp and turn["content"] == data_model.content:
+            return turn["reply"]
+        return None
+
 # Менеджер WebSocket соединений
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []  # Список активных соединений
+        self.sessions: dict[WebSocket, Session] = {}    # Сессии по соединениям
+        self.clients: dict[tuple, Session] = {}         # Сессии по (тип, client_id)
+        self.draining = False    # Новые сессии не принимаются
+        self.tasks = set()       # Фоновые задачи остановки
+
+    @property
+    def in_flight(self) -> int:
+        """Ходы, для которых сейчас генерируется ответ"""
+        return sum(session.busy for session in self.sessions.values())
+
+    async def connect(self, websocket: WebSocket, kind: str, client_id: int) -> Session | None:
+        """
+        Добавляет новое соединение и создает сессию (из контрольной точки, если она есть)
+
+        Returns:
+            Session: Сессия или None, если сервер останавливается
+        """
+        if self.draining:
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return None
+        subprotocol = WssCodec.negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
 
-    async def connect(self, websocket: WebSocket):
-        """Добавляет новое соединение"""
-        await websocket.accept()
+        # Переподключение после обрыва: прежнее соединение могло еще не заметить разрыв
+        previous = self.clients.get((kind, client_id))
+        if previous is not None:
+            await self.take_over(previous)
+
+        # Контрольная точка удаляется только после успешного восстановления
+        claim = session_store.claim_checkpoint(kind, client_id)
+        checkpoint = claim.data or {}
+        try:
+            tutor = await run_in_threadpool(TUTORS[kind], client_id, checkpoint.get("tutor"))
+        except Exception:
+            claim.release()
+            raise
+        claim.commit()
+
+        session = Session(kind, client_id, tutor, websocket, WssCodec(binary=subprotocol is not None),
+                          checkpoint.get("last_turn"))
         self.active_connections.append(websocket)
+        self.sessions[websocket] = session
+        self.clients[(kind, client_id)] = session
+        return session
+
+    async def take_over(self, session: Session):
+        """Сохраняет сессию прежнего соединения того же клиента (после хода) и закрывает его"""
+        while session.busy:
+            await asyncio.sleep(0.05)
+        if not session.handed_off:
+            self.hand_off(session)
+        try:
+            await session.websocket.close(code=CLOSE_NORMAL)
+        except (RuntimeError, OSError, WebSocketDisconnect):
+            pass  # Соединение уже закрыто
         
-    def disconnect(self, websocket: WebSocket):
-        """Удаляет соединение"""
-        self.active_connections.remove(websocket)
+    def disconnect(self, session: Session, code: int = CLOSE_NORMAL):
+        """
+        Удаляет соединение. Если клиент не завершил сессию сам (обрыв связи, ошибка,
+        перезапуск сервера), состояние сохраняется для восстановления при переподключении
+        """
+        if session.websocket in self.active_connections:
+            self.active_connections.remove(session.websocket)
+        self.sessions.pop(session.websocket, None)
+        if self.clients.get((session.kind, session.client_id)) is session:
+            del self.clients[(session.kind, session.client_id)]
+        if (code != CLOSE_NORMAL or self.draining) and not session.handed_off:
+            self.hand_off(session)
+
+    def hand_off(self, session: Session):
+        """
+        Сохраняет состояние сессии для восстановления другим процессом.
+        Во время хода не вызывается: состояние тьютора меняется в потоке генерации
+        """
+        checkpoint = {"tutor": session.tutor.checkpoint(), "last_turn": session.last_turn}
+        session_store.save_checkpoint(session.kind, session.client_id, checkpoint)
+        session.handed_off = True
+
+    async def generate(self, session: Session, data_model: WssItem) -> str:
+        """Генерирует ответ в пуле потоков, не блокируя цикл событий"""
+        session.busy = True
+        try:
+            if session.kind == "moral":
+                reply = await run_in_threadpool(session.tutor.generate_answer, data_model.content, data_model.type)
+            else:
+                reply = await run_in_threadpool(session.tutor.generate_answer, data_model.content)
+        finally:
+            session.busy = False
+        session.last_turn = {"timestamp": data_model.timestamp, "content": data_model.content, "reply": reply}
+        return reply
 
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
+    async def send_reconnect(self, session: Session):
+        """Просит клиента переподключиться и закрывает соединение"""
+        reconnect = WssItem(type="reconnect", content="", timestamp=datetime.now(timezone.utc).isoformat())
+        try:
+            await session.codec.send(session.websocket, reconnect)
+            await session.websocket.close(code=CLOSE_SERVICE_RESTART)
+        except (RuntimeError, OSError, WebSocketDisconnect):
+            pass  # Клиент уже отключился
+
+    async def drain(self, deadline: float) -> dict:
+        """
+        Останавливает прием сессий, ждет текущие ходы не дольше deadline секунд,
+        сохраняет свободные сессии и просит клиентов переподключиться. Сессии с ходом,
+        не завершившимся к сроку, сохраняет их обработчик после окончания хода
+
+        Returns:
+            dict: Количество переданных сессий и ходов, не завершившихся к сроку
+        """
+        self.draining = True
+        stop_at = time.monotonic() + deadline
+        while self.in_flight and time.monotonic() < stop_at:
+            await asyncio.sleep(0.05)
+
+        idle = [session for session in self.sessions.values() if not session.busy]
+        abandoned = len(self.sessions) - len(idle)
+        for session in idle:
+            if not session.handed_off:
+                self.hand_off(session)
+            await self.send_reconnect(session)
+        return {"sessions": len(idle), "abandoned_turns": abandoned}
+
+    async def send_personal_message(self, message: WssItem, websocket: WebSocket, codec: WssCodec):
         """Отправляет сообщение конкретному клиенту"""
-        await websocket.send_json(message)
+        await codec.send(websocket, message)
 
 manager = ConnectionManager()
 
-# WebSocket endpoint для dummy-режима
-@app.websocket("/test_1/ws/{client_id}")
-async def dummy_websocket_endpoint(websocket: WebSocket, client_id: int):
-    """Обработчик WebSocket для упрощенного тьютора"""
-    await manager.connect(websocket)
+@app.get("/health")
+def read_health():
+    """Готовность принимать сессии (503 во время остановки)"""
+    if manager.draining:
+        raise HTTPException(status_code=503, detail="draining")
+    return {"status": "ok", "sessions": len(manager.sessions), "in_flight": manager.in_flight}
+
+@app.post("/admin/drain")
+async def drain_server(deadline: float | None = None, x_admin_token: str | None = Header(default=None)):
+    """Переводит сервер в режим остановки с передачей сессий (по токену drain.admin_token)"""
+    settings = cfg.get_settings().drain
+    # За обратным прокси все запросы приходят с localhost, поэтому проверяется только токен
+    if not settings.admin_token or not secrets.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403)
+    if deadline is None:
+        deadline = settings.deadline
+    return await manager.drain(deadline)
+
+async def serve_session(websocket: WebSocket, kind: str, client_id: int):
+    """Цикл обработки сообщений одной сессии"""
+    session = None
+    code = CLOSE_NORMAL
     try:
-        virtual_tutor = DummyVirtualTutor(client_id)
+        session = await manager.connect(websocket, kind, client_id)
+        if session is None:
+            return
         while True:
             # Получаем сообщение от клиента
-            data = await websocket.receive_text()
-            data_dict = json.loads(data)
-            data_model = TypeAdapter(WssItem).validate_python(data_dict)
-            
-            # Генерируем ответ
-            actor_replic = virtual_tutor.generate_answer(data_model.content)
+            message = await websocket.receive()
+            try:
+                data_model = session.codec.decode(message)
+            except (ValueError, ValidationError) as error:
+                # Некорректный кадр отбрасывается, соединение продолжает работать
+                logger.warning(f"Сессия {kind}_{client_id}: некорректное сообщение ({error})")
+                continue
+            if session.handed_off:
+                return  # Клиент повторит сообщение после переподключения
+
+            # Генерируем ответ (повтор уже обработанного сообщения получает сохраненный ответ)
+            actor_replic = session.replay(data_model)
+            if actor_replic is None:
+                actor_replic = await manager.generate(session, data_model)
+                if manager.draining:
+                    # Остановка началась во время хода: состояние сохраняется вместе с ответом,
+                    # и если ответ не дойдет, повтор сообщения на новом процессе получит его
+                    manager.hand_off(session)
             data_model.content = actor_replic
             
             # Отправляем ответ
-            await manager.send_personal_message(data_model.model_dump(), websocket)
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+            await manager.send_personal_message(data_model, websocket, session.codec)
+            if session.handed_off:
+                await manager.send_reconnect(session)
+                return
+    except WebSocketDisconnect as disconnect:
+        code = disconnect.code
+    except Exception:
+        code = CLOSE_INTERNAL_ERROR
+        try:
+            await websocket.close(code=CLOSE_INTERNAL_ERROR)
+        except (RuntimeError, OSError):
+            pass  # Соединение уже закрыто
+        raise
+    finally:
+        # Сессия удаляется при любом завершении обработчика, в том числе из-за ошибки
+        if session is not None:
+            manager.disconnect(session, code)
+
+# WebSocket endpoint для dummy-режима
+@app.websocket("/test_1/ws/{client_id}")
+async def dummy_websocket_endpoint(websocket: WebSocket, client_id: int):
+    """Обработчик WebSocket для упрощенного тьютора"""
+    await serve_session(websocket, "dummy", client_id)
 
 # WebSocket endpoint для полноценного тьютора
 @app.websocket("/test_2/ws/{client_id}")
 async def moral_websocket_endpoint(websocket: WebSocket, client_id: int):
     """Обработчик WebSocket для тьютора с моральными схемами"""
-    await manager.connect(websocket)
-    try:
-        virtual_tutor = VirtualTutor(client_id)
-        while True:
-            data = await websocket.receive_text()
-            data_dict = json.loads(data) 
-            data_model = TypeAdapter(WssItem).validate_python(data_dict)
-            
-            actor_replic = virtual_tutor.generate_answer(data_model.content)
-            data_model.content = actor_replic
-            
-            await manager.send_personal_message(data_model.model_dump(), websocket)
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+    await serve_session(websocket, "moral", client_id)
 
 # Настройка статических файлов для интерфейсов
 
@@ -93,25 +350,28 @@ async def moral_websocket_endpoint(websocket: WebSocket, client_id: int):
 ui_dummy_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../ui_dummy"))
 ui_moral_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../ui_moral"))
 
+# В dev-режиме файлы читаются с диска без кэширования, иначе - хэшированные URL и сжатие
+static_files = StaticFilesWithoutCaching if cfg.get_settings().static.dev else PrecompressedStaticFiles
+
 # Монтируем статические файлы
-app.mount("/test_1", StaticFilesWithoutCaching(directory=ui_dummy_path, html=True), name="dummy_static")
-app.mount("/test_2", StaticFilesWithoutCaching(directory=ui_moral_path, html=True), name="moral_static")
+app.mount("/test_1", static_files(directory=ui_dummy_path, html=True), name="dummy_static")
+app.mount("/test_2", static_files(directory=ui_moral_path, html=True), name="moral_static")
 
 # Запуск сервера
 if __name__ == "__main__":
-    config = hlp.load_config()
-    if config["run_mode"] == "local":
+    settings = cfg.get_settings()
+    if settings.run_mode == "local":
         # Локальный режим с авто-перезагрузкой
         uvicorn.run(
             "test_server:app",
-            host=config["running"]["local"]["host"],
-            port=config["running"]["local"]["port"],
+            host=settings.running.local.host,
+            port=settings.running.local.port,
             reload=True
         )
     else:
         # Продакшен режим
         uvicorn.run(
             "test_server:app",
-            host=config["running"]["server"]["host"],
-            port=config["running"]["server"]["port"]
+            host=settings.running.server.host,
+            port=settings.running.server.port
         )
\ No newline at end of file
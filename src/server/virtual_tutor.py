@@ -3,10 +3,15 @@ import helper as hlp
 import logging
 from pathlib import Path
 import os
+import time
+import speculation
+import settings as cfg
 from base_moral_scheme import BaseMoralScheme
+from essay_analysis import EssayAnalyzer, SectionVerdict
+from essay_diff import EssayDraft
 from oai_interface import Interface
 
-def create_logger(logger_name, log_dir, log_file):
+def create_logger(logger_name, log_dir, log_file, mode='w'):
     """
     Создает и настраивает логгер с записью в файл
     
@@ -14,6 +19,7 @@ def create_logger(logger_name, log_dir, log_file):
         logger_name (str): Уникальное имя логгера
         log_dir (str): Директория для логов
         log_file (str): Имя файла лога
+        mode (str): 'w' - новый лог, 'a' - дописать (восстановленная сессия)
         
     Returns:
         Logger: Настроенный объект логгера
@@ -24,10 +30,15 @@ def create_logger(logger_name, log_dir, log_file):
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.INFO)
     
+    # Сессия, восстановленная в том же процессе, не должна писать в лог дважды
+    for old_handler in logger.handlers[:]:
+        logger.removeHandler(old_handler)
+        old_handler.close()
+    
     # Настройка обработчика для записи в файл
     handler = logging.FileHandler(
         os.path.join(log_dir, log_file),
-        mode='w',
+        mode=mode,
         encoding='utf-8'
     )
     
@@ -40,12 +51,13 @@ def create_logger(logger_name, log_dir, log_file):
 class DummyVirtualTutor:
     """Упрощенная версия тьютора без анализа эмоций"""
     
-    def __init__(self, id):
+    def __init__(self, id, checkpoint=None):
         """
         Инициализация dummy-тьютора
         
         Args:
             id (int): Уникальный ID сессии
+            checkpoint (dict, optional): Состояние сессии из checkpoint() другого процесса
         """
         self.client_id = id
         
@@ -59,19 +71,34 @@ class DummyVirtualTutor:
         self.logger_dialog = create_logger(
             f"dialog_logger_{self.client_id}",
             f"../../logs_dummy/{self.client_id}",
-            "dialog.log"
+            "dialog.log",
+            mode='a' if checkpoint else 'w'
         )
         
         self.logger_essay = create_logger(
             f"essay_logger_{self.client_id}",
             f"../../logs_dummy/{self.client_id}",
-            "essay.log"
+            "essay.log",
+            mode='a' if checkpoint else 'w'
         )
         
         # Запись в лог
         self.logger_dialog.info("Dummy tutor initialized")
         self.logger_essay.info("Essay logger initialized")
         
+        if checkpoint:
+            self.messages = checkpoint["messages"]
+            self.logger_dialog.info("Session restored from checkpoint")
+    
+    def checkpoint(self):
+        """
+        Состояние сессии для передачи другому процессу
+        
+        Returns:
+            dict: История диалога
+        """
+        return {"messages": self.messages}
+        
     def generate_answer(self, replic):
         """
         Генерирует ответ на реплику студента
@@ -97,12 +124,13 @@ class DummyVirtualTutor:
 class VirtualTutor:
     """Основной класс тьютора с моральными схемами"""
     
-    def __init__(self, id):
+    def __init__(self, id, checkpoint=None):
         """
         Инициализация тьютора с моральными схемами
         
         Args:
             id (int): Уникальный ID сессии
+            checkpoint (dict, optional): Состояние сессии из checkpoint() другого процесса
         """
         self.client_id = id
         
@@ -110,13 +138,15 @@ class VirtualTutor:
         self.logger_dialog = create_logger(
             f"dialog_logger_{self.client_id}",
             f"../../logs_moral/{self.client_id}",
-            "dialog.log"
+            "dialog.log",
+            mode='a' if checkpoint else 'w'
         )
         
         self.logger_essay = create_logger(
             f"essay_logger_{self.client_id}",
             f"../../logs_moral/{self.client_id}",
-            "essay.log"
+            "essay.log",
+            mode='a' if checkpoint else 'w'
         )
         
         self.logger_dialog.info("Moral tutor initialized")
@@ -141,13 +171,130 @@ class VirtualTutor:
         self.messages = [{"role": "assistant", "content": hlp.start_promt_dvt}]
         self.schemes = [False, False, False, False]  # Флаги завершения этапов
         self.brain = [False, False, False, False]    # Флаги условий перехода
+        self.essay_draft = EssayDraft()  # Последний черновик эссе и вердикты по разделам
+        self.essay_analyzer = EssayAnalyzer(self.ms_list[2].oai_interface)
+        
+        if checkpoint:
+            self._restore(checkpoint)
+            self.logger_dialog.info("Session restored from checkpoint")
 
-    def generate_answer(self, replic):
+    def checkpoint(self):
+        """
+        Состояние сессии для передачи другому процессу
+        
+        Returns:
+            dict: История диалога, этапы, векторы моральных схем и черновик эссе
+        """
+        return {
+            "messages": self.messages,
+            "last_replic": self.last_replic,
+            "prev_moral_id": self.prev_moral_id,
+            "cur_moral_id": self.cur_moral_id,
+            "schemes": self.schemes,
+            "brain": self.brain,
+            "moral_schemes": [ms.get_state() for ms in self.ms_list],
+            "essay_draft": self.essay_draft.to_dict()
+        }
+
+    def _restore(self, checkpoint):
+        """Восстанавливает состояние из checkpoint()"""
+        self.messages = checkpoint["messages"]
+        self.last_replic = checkpoint["last_replic"]
+        self.prev_moral_id = checkpoint["prev_moral_id"]
+        self.cur_moral_id = checkpoint["cur_moral_id"]
+        self.schemes = checkpoint["schemes"]
+        self.brain = checkpoint["brain"]
+        for ms, state in zip(self.ms_list, checkpoint["moral_schemes"]):
+            ms.set_state(state)
+        self.essay_draft = EssayDraft.from_dict(checkpoint["essay_draft"], SectionVerdict.from_reply)
+
+    def _essay_feedback(self, essay_diff, essay_verdict):
+        """
+        Измененные разделы эссе с замечаниями для генерации ответа
+
+        Args:
+            essay_diff (EssayDiff): Сравнение с предыдущим черновиком
+            essay_verdict (EssayVerdict): Результат проверки или None до этапа 3
+
+        Returns:
+            str: Текст для последней реплики в промпте get_replic
+        """
+        lines = []
+        if not essay_diff.has_changes():
+            lines.append("Студент повторно отправил эссе без изменений")
+        else:
+            lines.append(f"Студент отправил черновик эссе {essay_diff.version}. Новые и измененные разделы:")
+            for i in essay_diff.changed:
+                lines.append(f"[{i + 1}] {essay_diff.sections[i]}")
+                verdict = essay_verdict.sections[i] if essay_verdict else None
+                if verdict is not None and verdict.comment:
+                    lines.append(f"Замечания: {verdict.comment}")
+            if essay_diff.removed:
+                lines.append(f"Удалено разделов: {essay_diff.removed}")
+            if len(essay_diff.changed) < len(essay_diff.sections):
+                lines.append("Остальные разделы не изменились с прошлого черновика")
+        if essay_verdict:
+            lines.append(essay_verdict.to_prompt())
+        return "\n".join(lines)
+
+    def _speculative_transition(self, replic, reply_text, intents, diff):
+        """
+        Проверяет переход между этапами и одновременно генерирует ответ
+        в предположении, что этап не изменится
+
+        Args:
+            replic (str): Реплика студента (для эссе - diff черновика) для проверки перехода
+            reply_text (str): Последняя реплика для промпта get_replic
+            intents (dict): Словарь интенций текущего этапа
+            diff (np.array): Разница между оценками и чувствами
+
+        Returns:
+            tuple: (ответ get_brain_status, ответ тьютора или None, если этап изменился или пул занят)
+        """
+        stage = self.cur_moral_id
+        interface = self.ms_list[stage].oai_interface
+        messages = self.messages.copy()
+
+        def speculate():
+            started = time.monotonic()
+            reply = interface.get_replic(reply_text, messages, intents, diff, stage, stage)
+            return reply, time.monotonic() - started, interface.last_usage_tokens()
+
+        future = speculation.submit(speculate)
+        if future is None:
+            # Пул занят - ответ будет сгенерирован после проверки перехода
+            speculation.stats.record_skip(stage)
+            return interface.get_brain_status(messages, replic, stage), None
+
+        started = time.monotonic()
+        condition = interface.get_brain_status(messages, replic, stage)
+        brain_sec = time.monotonic() - started
+
+        if condition and "да" in condition.lower():
+            # Этап меняется - спекулятивный ответ не подходит
+            if future.cancel():
+                speculation.stats.record_miss(stage, 0)
+            else:
+                # Запрос уже отправлен: учитываем потраченные токены после его завершения
+                future.add_done_callback(lambda f: speculation.stats.record_miss(
+                    stage, f.result()[2] if f.exception() is None else 0))
+            self.logger_dialog.warning('Speculation: miss')
+            return condition, None
+
+        reply, reply_sec, _ = future.result()
+        # Последовательно ушло бы brain_sec + reply_sec, параллельно - максимум из них
+        saved_sec = min(brain_sec, reply_sec)
+        speculation.stats.record_hit(stage, saved_sec)
+        self.logger_dialog.warning(f'Speculation: hit, saved {saved_sec:.2f}s')
+        return condition, reply
+
+    def generate_answer(self, replic, replic_type="chat"):
         """
         Основной метод генерации ответа с учетом моральных схем
         
         Args:
             replic (str): Реплика студента
+            replic_type (str): Тип сообщения ('chat' или 'essay')
             
         Returns:
             str: Ответ тьютора
@@ -159,16 +306,30 @@ class VirtualTutor:
         self.logger_dialog.warning(f'Схемы: {self.schemes}')
         self.logger_dialog.warning(f'Переходы: {self.brain}')
         
+        # Для эссе анализируем только разделы, изменившиеся с прошлого черновика
+        essay_diff = None
+        essay_verdict = None
+        student_text = replic
+        if replic_type == "essay":
+            essay_diff = self.essay_draft.diff(replic)
+            self.logger_essay.info(essay_diff.summary())
+            student_text = essay_diff.changed_text()
+            # Проверка по критериям a-p нужна начиная с этапа написания эссе
+            if self.cur_moral_id >= 2:
+                essay_verdict = self.essay_analyzer.analyze(essay_diff, self.essay_draft)
+                self.logger_essay.info(f"Verdict: {essay_verdict.summary()}")
+        
         # Получаем текущие интенции и анализируем реплику
         intents = self.ms_list[self.cur_moral_id].get_base_intentions()
-        action = self.ms_list[self.cur_moral_id].oai_interface.get_composition(intents, replic)
-        
-        if action is None:
-            self.logger_dialog.error("API request failed")
-            return "Не удалось связаться с сервером"
-        
-        # Обновляем векторы состояния
-        self.ms_list[self.cur_moral_id].update_vectors(np.array(action))
+        if student_text:
+            action = self.ms_list[self.cur_moral_id].oai_interface.get_composition(intents, student_text)
+            
+            if action is None:
+                self.logger_dialog.error("API request failed")
+                return "Не удалось связаться с сервером"
+            
+            # Обновляем векторы состояния
+            self.ms_list[self.cur_moral_id].update_vectors(np.array(action))
         
         # Получаем текущие состояния
         appr_state = self.ms_list[self.cur_moral_id].get_appraisals_state()
@@ -182,10 +343,26 @@ class VirtualTutor:
         self.logger_dialog.warning(f'Feelings: {self.ms_list[self.cur_moral_id].get_feelings()}')
         self.logger_dialog.warning(f'Distance: {dist}')
         
+        # Сохраняем этап до проверки перехода
+        self.prev_moral_id = self.cur_moral_id
+        
+        diff = appr_state - feel_state
+        reply_text = self._essay_feedback(essay_diff, essay_verdict) if essay_diff else replic
+        # Для проверки перехода эссе передается компактным diff, а не полным текстом
+        brain_text = essay_diff.summary() if essay_diff else replic
+        reply = None
+        
         # Проверяем условия перехода между этапами
         if self.cur_moral_id <= 2:  # Для этапов 0-2
-            condition = self.ms_list[self.cur_moral_id].oai_interface.get_brain_status(
-                self.messages, replic, self.cur_moral_id)
+            if essay_verdict and self.cur_moral_id == 2:
+                # На этапе эссе переход решает структурированный вердикт
+                condition = "да" if essay_verdict.is_complete() else "нет"
+            elif cfg.get_settings().speculative_replies:
+                # Генерация ответа параллельно с проверкой перехода между этапами
+                condition, reply = self._speculative_transition(brain_text, reply_text, intents, diff)
+            else:
+                condition = self.ms_list[self.cur_moral_id].oai_interface.get_brain_status(
+                    self.messages, brain_text, self.cur_moral_id)
             
             self.logger_dialog.warning(f'Condition: {condition}')
             
@@ -197,20 +374,20 @@ class VirtualTutor:
         if dist < 0.25:
             self.schemes[self.cur_moral_id] = True
         
-        # Сохраняем предыдущий этап
-        self.prev_moral_id = self.cur_moral_id
-        
-        # Генерируем ответ с учетом разницы состояний
-        diff = appr_state - feel_state
-        reply = self.ms_list[self.cur_moral_id].oai_interface.get_replic(
-            replic, self.messages, intents, diff, self.prev_moral_id, self.cur_moral_id)
+        # Генерируем ответ с учетом разницы состояний (если спекулятивный не подошел)
+        if reply is None:
+            reply = self.ms_list[self.cur_moral_id].oai_interface.get_replic(
+                reply_text, self.messages, intents, diff, self.prev_moral_id, self.cur_moral_id)
         
-        # Обновляем историю диалога
-        self.messages.append({"role": "user", "content": replic})
+        # Обновляем историю диалога: для эссе хранится компактный diff, а не полная копия
+        history_text = essay_diff.summary() if essay_diff else replic
+        self.messages.append({"role": "user", "content": history_text})
         self.messages.append({"role": "assistant", "content": reply})
+        if essay_diff:
+            self.essay_draft.commit(essay_diff)
         
         # Логируем диалог
-        self.logger_dialog.info(f"Student: {replic}")
+        self.logger_dialog.info(f"Student: {history_text}")
         self.logger_dialog.info(f"Tutor: {reply}")
         
         return reply
\ No newline at end of file
@@ -0,0 +1,98 @@
+from pydantic import TypeAdapter
+from starlette.websockets import WebSocketDisconnect
+from request_contracts import WssItem
+
+# Подпротокол WebSocket для компактных бинарных кадров
+BINARY_SUBPROTOCOL = "vt.bin.v1"
+
+# Коды типов сообщений в бинарном кадре
+TYPE_CODES = {"chat": 0, "essay": 1}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+# Валидатор и сериализатор создаются один раз на процесс
+wss_adapter = TypeAdapter(WssItem)
+
+def decode_json(data):
+    """
+    Разбирает и валидирует JSON-сообщение за один проход
+
+    Args:
+        data (str | bytes): JSON-текст сообщения
+
+    Returns:
+        WssItem: Сообщение
+    """
+    return wss_adapter.validate_json(data)
+
+def encode_json(item):
+    """Сериализует сообщение в JSON-строку"""
+    return wss_adapter.dump_json(item).decode("utf-8")
+
+def decode_binary(data):
+    """
+    Разбирает бинарный кадр: [код типа: 1 байт][длина метки: 1 байт][метка ASCII][текст UTF-8]
+
+    Args:
+        data (bytes): Кадр
+
+    Returns:
+        WssItem: Сообщение
+    """
+    if len(data) < 2 or data[0] not in TYPE_NAMES or len(data) < 2 + data[1]:
+        raise ValueError("Некорректный бинарный кадр")
+    ts_end = 2 + data[1]
+    return WssItem.model_construct(
+        type=TYPE_NAMES[data[0]],
+        timestamp=data[2:ts_end].decode("ascii"),
+        content=data[ts_end:].decode("utf-8")
+    )
+
+def encode_binary(item):
+    """Собирает бинарный кадр сообщения (формат - см. decode_binary)"""
+    timestamp = item.timestamp.encode("ascii")
+    return bytes((TYPE_CODES[item.type], len(timestamp))) + timestamp + item.content.encode("utf-8")
+
+class WssCodec:
+    """Кодек сообщений одного соединения: JSON или бинарные кадры по согласованному подпротоколу"""
+
+    def __init__(self, binary=False):
+        """
+        Args:
+            binary (bool): Клиент согласовал подпротокол BINARY_SUBPROTOCOL
+        """
+        self.binary = binary
+
+    @staticmethod
+    def negotiate(websocket):
+        """
+        Выбирает подпротокол из предложенных клиентом
+
+        Returns:
+            str: BINARY_SUBPROTOCOL или None для JSON
+        """
+        offered = websocket.scope.get("subprotocols", [])
+        return BINARY_SUBPROTOCOL if BINARY_SUBPROTOCOL in offered else None
+
+    def decode(self, message):
+        """
+        Разбирает ASGI-сообщение websocket.receive
+
+        Args:
+            message (dict): Результат websocket.receive()
+
+        Returns:
+            WssItem: Сообщение клиента
+        """
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            data = message["bytes"]
+            return decode_binary(data) if self.binary else decode_json(data)
+        return decode_json(message["text"])
+
+    async def send(self, websocket, item):
+        """Отправляет сообщение клиенту в согласованном формате"""
+        if self.binary and item.type in TYPE_CODES:
+            await websocket.send_bytes(encode_binary(item))
+        else:
+            await websocket.send_text(encode_json(item))
@@ -1,25 +1,54 @@
 // Генерация уникального ID клиента на основе текущего времени
 const client_id = Date.now()
 
-// Создание WebSocket соединения с локальным сервером
-let web_socket = new WebSocket(`ws://127.0.0.1:8000/test_1/ws/${client_id}`);
+// Адрес WebSocket сервера (локальный)
+const WS_URL = `ws://127.0.0.1:8000/test_1/ws/${client_id}`;
 // Альтернативный вариант подключения к удаленному серверу (закомментирован)
-// let web_socket = new WebSocket(`ws://bica-project.tw1.ru/test/ws/${client_id}`);
+// const WS_URL = `ws://bica-project.tw1.ru/test/ws/${client_id}`;
 
-// Обработчик открытия соединения WebSocket
-web_socket.onopen = () => {
-    console.log('WebSocket Connection established');
-};
+let web_socket = null;
+let reconnectDelay = 500;    // Задержка переподключения, удваивается до 10 секунд
+let pendingMessage = null;   // Сообщение без ответа - повторяется после переподключения
 
-// Обработчик входящих сообщений через WebSocket
-web_socket.onmessage = (event) => {
-    // Парсинг полученных данных
-    const response = JSON.parse(event.data);
-    console.log(response)
-    // Скрытие индикатора набора и добавление сообщения в чат
-    hideTypingIndicator()
-    addMessage(response.content, false);
-};
+// Отправка сообщения (если соединения нет - после переподключения)
+function sendData(data) {
+    pendingMessage = data;
+    if (web_socket.readyState !== WebSocket.OPEN) return;
+    web_socket.send(JSON.stringify(data));
+}
+
+// Создание WebSocket соединения; сессия с тем же client_id восстанавливается сервером
+function connect() {
+    web_socket = new WebSocket(WS_URL);
+
+    // Обработчик открытия соединения WebSocket
+    web_socket.onopen = () => {
+        console.log('WebSocket Connection established');
+        reconnectDelay = 500;
+        if (pendingMessage) sendData(pendingMessage);
+    };
+
+    // Обработчик входящих сообщений через WebSocket
+    web_socket.onmessage = (event) => {
+        // Парсинг полученных данных
+        const response = JSON.parse(event.data);
+        console.log(response)
+        // Сервер перезапускается - соединение будет закрыто и восстановлено
+        if (response.type === 'reconnect') return;
+        pendingMessage = null;
+        // Скрытие индикатора набора и добавление сообщения в чат
+        hideTypingIndicator()
+        addMessage(response.content, false);
+    };
+
+    // Переподключение после перезапуска сервера (коды 1012/1013) или обрыва связи
+    web_socket.onclose = () => {
+        setTimeout(connect, reconnectDelay);
+        reconnectDelay = Math.min(reconnectDelay * 2, 10000);
+    };
+}
+
+connect();
 
 // Получение DOM-элементов
 const dialogEditor = document.getElementById('dialogEditor');
@@ -64,17 +93,14 @@ async function submitDialog() {
     showTypingIndicator(); // Показать индикатор набора
     
     try {
-        // Проверка состояния WebSocket соединения
-        if (web_socket.readyState === WebSocket.OPEN) {
-            const data_dialog = {
-                type: 'chat', // Тип сообщения - чат
-                content: message, // Текст сообщения
-                timestamp: new Date().toISOString() // Временная метка
-            };
-            // Отправка данных через WebSocket
-            web_socket.send(JSON.stringify(data_dialog));
-            console.log(data_dialog.content)
-        }
+        const data_dialog = {
+            type: 'chat', // Тип сообщения - чат
+            content: message, // Текст сообщения
+            timestamp: new Date().toISOString() // Временная метка
+        };
+        // Отправка данных через WebSocket (или после переподключения)
+        sendData(data_dialog);
+        console.log(data_dialog.content)
     } catch (error) {
         hideTypingIndicator();
         console.error('Error submitting dialog:', error);
@@ -86,16 +112,14 @@ async function submitDialog() {
 async function submitEssay() {
     showTypingIndicator(); // Показать индикатор набора
     try {
-        if (web_socket.readyState === WebSocket.OPEN) {
-            const data_essay = {
-                type: 'essay', // Тип сообщения - эссе
-                content: essayEditor.value, // Текст эссе
-                timestamp: new Date().toISOString() // Временная метка
-            };
-            // Отправка данных через WebSocket
-            web_socket.send(JSON.stringify(data_essay));
-            console.log(data_essay.content)
-        }
+        const data_essay = {
+            type: 'essay', // Тип сообщения - эссе
+            content: essayEditor.value, // Текст эссе
+            timestamp: new Date().toISOString() // Временная метка
+        };
+        // Отправка данных через WebSocket (или после переподключения)
+        sendData(data_essay);
+        console.log(data_essay.content)
     } catch (error) {
         hideTypingIndicator();
         console.error('Error submitting essay:', error);
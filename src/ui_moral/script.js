@@ -1,25 +1,88 @@
 // Генерация уникального ID клиента на основе текущего времени
 const client_id = Date.now()
 
-// Создание WebSocket соединения с локальным сервером (версия для морального модуля)
-let web_socket = new WebSocket(`ws://127.0.0.1:8000/test_2/ws/${client_id}`);
+// Подпротокол компактных бинарных кадров (если сервер его не поддерживает - используется JSON)
+const BINARY_PROTOCOL = 'vt.bin.v1';
+const TYPE_CODES = { chat: 0, essay: 1 };
+const TYPE_NAMES = ['chat', 'essay'];
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+// Адрес WebSocket сервера (версия для морального модуля)
+const WS_URL = `ws://127.0.0.1:8000/test_2/ws/${client_id}`;
 // Альтернативный вариант подключения к удаленному серверу (закомментирован)
-// let web_socket = new WebSocket(`ws://bica-project.tw1.ru/test/ws/${client_id}`);
-
-// Обработчик успешного открытия соединения
-web_socket.onopen = () => {
-    console.log('WebSocket Connection established');
-};
-
-// Обработчик входящих сообщений от сервера
-web_socket.onmessage = (event) => {
-    // Парсинг полученных данных JSON
-    const response = JSON.parse(event.data);
-    console.log(response)
-    // Скрытие индикатора набора и добавление сообщения в чат
-    hideTypingIndicator()
-    addMessage(response.content, false); // false - сообщение от тьютора
-};
+// const WS_URL = `ws://bica-project.tw1.ru/test/ws/${client_id}`;
+
+let web_socket = null;
+let reconnectDelay = 500;    // Задержка переподключения, удваивается до 10 секунд
+let pendingMessage = null;   // Сообщение без ответа - повторяется после переподключения
+
+// Бинарный кадр: [код типа: 1 байт][длина метки: 1 байт][метка времени][текст UTF-8]
+function encodeFrame(data) {
+    const timestamp = textEncoder.encode(data.timestamp);
+    const content = textEncoder.encode(data.content);
+    const frame = new Uint8Array(2 + timestamp.length + content.length);
+    frame[0] = TYPE_CODES[data.type];
+    frame[1] = timestamp.length;
+    frame.set(timestamp, 2);
+    frame.set(content, 2 + timestamp.length);
+    return frame;
+}
+
+function decodeFrame(buffer) {
+    const frame = new Uint8Array(buffer);
+    const tsEnd = 2 + frame[1];
+    return {
+        type: TYPE_NAMES[frame[0]],
+        timestamp: textDecoder.decode(frame.subarray(2, tsEnd)),
+        content: textDecoder.decode(frame.subarray(tsEnd))
+    };
+}
+
+// Отправка сообщения в формате, согласованном с сервером
+function sendData(data) {
+    pendingMessage = data;
+    if (web_socket.readyState !== WebSocket.OPEN) return; // Отправится после переподключения
+    if (web_socket.protocol === BINARY_PROTOCOL) {
+        web_socket.send(encodeFrame(data));
+    } else {
+        web_socket.send(JSON.stringify(data));
+    }
+}
+
+// Создание WebSocket соединения; сессия с тем же client_id восстанавливается сервером
+function connect() {
+    web_socket = new WebSocket(WS_URL, [BINARY_PROTOCOL]);
+    web_socket.binaryType = 'arraybuffer';
+
+    // Обработчик успешного открытия соединения
+    web_socket.onopen = () => {
+        console.log('WebSocket Connection established');
+        reconnectDelay = 500;
+        if (pendingMessage) sendData(pendingMessage);
+    };
+
+    // Обработчик входящих сообщений от сервера
+    web_socket.onmessage = (event) => {
+        // Разбор бинарного кадра или JSON
+        const response = event.data instanceof ArrayBuffer ? decodeFrame(event.data) : JSON.parse(event.data);
+        console.log(response)
+        // Сервер перезапускается - соединение будет закрыто и восстановлено
+        if (response.type === 'reconnect') return;
+        pendingMessage = null;
+        // Скрытие индикатора набора и добавление сообщения в чат
+        hideTypingIndicator()
+        addMessage(response.content, false); // false - сообщение от тьютора
+    };
+
+    // Переподключение после перезапуска сервера (коды 1012/1013) или обрыва связи
+    web_socket.onclose = () => {
+        setTimeout(connect, reconnectDelay);
+        reconnectDelay = Math.min(reconnectDelay * 2, 10000);
+    };
+}
+
+connect();
 
 // Получение DOM-элементов
 const dialogEditor = document.getElementById('dialogEditor');
@@ -64,17 +127,14 @@ async function submitDialog() {
     showTypingIndicator(); // Показать индикатор набора
     
     try {
-        // Проверить состояние соединения
-        if (web_socket.readyState === WebSocket.OPEN) {
-            const data_dialog = {
-                type: 'chat', // Тип сообщения - чат
-                content: message,
-                timestamp: new Date().toISOString() // Временная метка
-            };
-            // Отправить данные через WebSocket
-            web_socket.send(JSON.stringify(data_dialog));
-            console.log(data_dialog.content)
-        }
+        const data_dialog = {
+            type: 'chat', // Тип сообщения - чат
+            content: message,
+            timestamp: new Date().toISOString() // Временная метка
+        };
+        // Отправить данные через WebSocket (или после переподключения)
+        sendData(data_dialog);
+        console.log(data_dialog.content)
     } catch (error) {
         hideTypingIndicator();
         console.error('Error submitting dialog:', error);
@@ -86,15 +146,13 @@ async function submitDialog() {
 async function submitEssay() {
     showTypingIndicator(); // Показать индикатор набора
     try {
-        if (web_socket.readyState === WebSocket.OPEN) {
-            const data_essay = {
-                type: 'essay', // Тип сообщения - эссе
-                content: essayEditor.value,
-                timestamp: new Date().toISOString()
-            };
-            web_socket.send(JSON.stringify(data_essay));
-            console.log(data_essay.content)
-        }
+        const data_essay = {
+            type: 'essay', // Тип сообщения - эссе
+            content: essayEditor.value,
+            timestamp: new Date().toISOString()
+        };
+        sendData(data_essay);
+        console.log(data_essay.content)
     } catch (error) {
         hideTypingIndicator();
         console.error('Error submitting essay:', error);